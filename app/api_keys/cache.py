@@ -0,0 +1,47 @@
+from datetime import datetime, UTC
+
+from app.cache import MISSING, TTLCache
+from app.config import settings
+
+
+class APIKeyCache(TTLCache):
+    """
+    Bounded LRU cache of verified API key records, keyed by the hashed key.
+
+    Unknown keys are cached as ``None`` for a shorter TTL so that repeated
+    lookups of a bad key do not hit the database either.
+
+    The cache lives in each worker process and invalidate() only reaches the
+    worker serving the revocation: other workers may accept a revoked or
+    renewed key until their entry expires, so ``ttl`` bounds that delay.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float):
+        super().__init__(maxsize, ttl)
+        self.negative_ttl = negative_ttl
+
+    def get(self, hashed_key: str):
+        """
+        Returns the cached record, ``None`` for a cached unknown key,
+        or ``MISSING`` when the database has to be consulted.
+        """
+        record = super().get(hashed_key)
+        return dict(record) if isinstance(record, dict) else record
+
+    def set(self, hashed_key: str, record: dict, expiration_time: datetime | None = None) -> None:
+        ttl = self.ttl
+        if expiration_time is not None:
+            if expiration_time.tzinfo is None:
+                expiration_time = expiration_time.replace(tzinfo=UTC)
+            ttl = min(ttl, (expiration_time - datetime.now(UTC)).total_seconds())
+        self.put(hashed_key, dict(record), ttl)
+
+    def set_missing(self, hashed_key: str) -> None:
+        self.put(hashed_key, None, self.negative_ttl)
+
+
+api_key_cache = APIKeyCache(
+    maxsize=settings.apikey_cache_size,
+    ttl=settings.apikey_cache_ttl_seconds,
+    negative_ttl=settings.apikey_negative_cache_ttl_seconds,
+)
@@ -1,22 +1,36 @@
 import hashlib
-import threading
-import uuid
-from typing import List
+from typing import List, Literal
 from datetime import datetime, UTC, timedelta
 
 from sqlalchemy import (Column, Integer, String, ForeignKey, Boolean,
                         TIMESTAMP,
-                        JSON, desc)
+                        JSON, Index, Table, select, update, case, and_, or_)
 from sqlalchemy.sql import func
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi import HTTPException, status
 
 
 from app.database import Base, SessionLocal
 from app.config import settings
+from app.api_keys.cache import api_key_cache, MISSING
+from app.api_keys.pagination import decode_cursor
+from app.api_keys.signing import api_key_signer
+from app.api_keys.sweeper import KeySweeper
+from app.api_keys.usage import UsageWriter
+
+
+KeyStatus = Literal["active", "expired", "revoked"]
+Resolution = Literal["minute", "hour", "day"]
+RESOLUTION_SECONDS: dict[str, int] = {"minute": 60, "hour": 3600, "day": 86400}
 
 
 class APIKey(Base):
     __tablename__ = "api_keys"
+    __table_args__ = (
+        # serves the per-user listing, newest usage first
+        Index("ix_api_keys_user_uid_last_query_date", "user_uid", "last_query_date"),
+    )
     api_key = Column(String, primary_key=True, index=True)
     name = Column(String)
     user_uid = Column(String, ForeignKey("users.uid"))
@@ -33,91 +47,343 @@ class APIKey(Base):
         return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
 
     @classmethod
-    def create_key(
+    async def create_key(
             self,
-            db: Session,
+            db: AsyncSession,
             name: str,
             user_uid: str,
             never_expire: bool,
             iam_roles: list[str],
             config: dict,
     ) -> str:
-        api_key = str(uuid.uuid4())
+        expiration_time = datetime.now(UTC) + timedelta(hours=settings.default_apikey_ttl_hour)
+        api_key = api_key_signer.issue(None if never_expire else expiration_time)
         db_api_key = APIKey(
             api_key=self.hash_api_key(api_key),
             name=name,
             user_uid=user_uid,
             never_expire=never_expire,
-            expiration_time=datetime.now(UTC)
-            + timedelta(hours=settings.default_apikey_ttl_hour),
+            expiration_time=expiration_time,
             last_query_date=datetime.now(UTC),
             iam_roles=iam_roles,
             config=config,
         )
         db.add(db_api_key)
-        db.commit()
-        db.refresh(db_api_key)
+        await db.commit()
         return api_key
 
     @classmethod
-    def _update_usage(cls, api_key: str) -> None:
-        db: Session = SessionLocal()
-        try:
-            row = db.query(cls).filter(cls.api_key == cls.hash_api_key(api_key)).first()
-            if row:
-                row.total_queries += 1
-                row.last_query_date = datetime.now(UTC)
-                db.commit()
-        except Exception:
-            db.rollback()
-            raise
-        finally:
-            db.close()
-
-    @classmethod
-    def get_usage_status(cls, db: Session, user_uid: str) -> List["APIKey"]:
+    async def get_usage_status(
+            cls,
+            db: AsyncSession,
+            user_uid: str,
+            limit: int,
+            after: str | None = None,
+            key_status: KeyStatus | None = None,
+            unused_since: datetime | None = None,
+    ) -> List["APIKey"]:
         """
         Lấy danh sách API keys của user, sắp xếp theo latest_query_date (mới nhất trước).
+
+        Pages of limit keys follow the (user_uid, last_query_date) index
+        backwards; after is the cursor of the previous page.
         """
-        return (
-            db.query(cls)
+        query = (
+            select(cls)
             .filter(cls.user_uid == user_uid)
-            .order_by(desc(cls.last_query_date))
-            .all()
+            .order_by(cls.last_query_date.desc().nulls_first(), cls.api_key.desc())
+            .limit(limit)
         )
+        if after is not None:
+            last_query_date, hashed_key = decode_cursor(after)
+            if last_query_date is None:
+                query = query.filter(or_(
+                    and_(cls.last_query_date.is_(None), cls.api_key < hashed_key),
+                    cls.last_query_date.is_not(None),
+                ))
+            else:
+                query = query.filter(or_(
+                    cls.last_query_date < last_query_date,
+                    and_(cls.last_query_date == last_query_date, cls.api_key < hashed_key),
+                ))
+        now = datetime.now(UTC)
+        if key_status == "active":
+            query = query.filter(cls.is_active, cls.never_expire | (cls.expiration_time > now))
+        elif key_status == "expired":
+            query = query.filter(cls.is_active, ~cls.never_expire, cls.expiration_time <= now)
+        elif key_status == "revoked":
+            query = query.filter(~cls.is_active)
+        if unused_since is not None:
+            query = query.filter(or_(cls.last_query_date.is_(None), cls.last_query_date < unused_since))
+        return list((await db.execute(query)).scalars().all())
 
     @classmethod
-    def check_key(cls, db: Session, api_key: str) -> dict | None:
+    async def get_usage_series(
+            cls,
+            db: AsyncSession,
+            user_uid: str,
+            resolution: Resolution,
+            start: datetime,
+            end: datetime,
+            hashed_key: str | None = None,
+    ) -> list[tuple[datetime, int]]:
         """
-        Checks if an API key is valid (ORM style with Session)
+        Requests per bucket of the given resolution in [start, end), summed
+        over the keys of user_uid or restricted to hashed_key. Buckets without
+        requests are left out.
         """
-        row = (
-            db.query(cls)
+        width = RESOLUTION_SECONDS[resolution]
+        if not usage_writer.retention.get(width):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Usage is not recorded per {resolution}",
+            )
+        if start >= end:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+        if (end - start).total_seconds() / width > settings.usage_series_max_points:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"More than {settings.usage_series_max_points} buckets, use a coarser resolution",
+            )
+        first_bucket = datetime.fromtimestamp(int(start.timestamp()) // width * width, UTC)
+        query = (
+            select(APIKeyUsage.bucket, func.sum(APIKeyUsage.count))
             .filter(
-                (cls.api_key == cls.hash_api_key(api_key)) &
-                (cls.never_expire | (cls.expiration_time > datetime.now(UTC)))
+                APIKeyUsage.user_uid == user_uid,
+                APIKeyUsage.resolution == width,
+                APIKeyUsage.bucket >= first_bucket,
+                APIKeyUsage.bucket < end,
             )
-            .first()
+            .group_by(APIKeyUsage.bucket)
+            .order_by(APIKeyUsage.bucket)
         )
+        if hashed_key is not None:
+            query = query.filter(APIKeyUsage.api_key == hashed_key)
+        return [(bucket, int(count)) for bucket, count in (await db.execute(query)).all()]
+
+    @classmethod
+    async def revoke_key(cls, db: AsyncSession, user_uid: str, api_key: str) -> None:
+        """
+        Revokes an API key owned by user_uid.
+        """
+        hashed_key = cls.hash_api_key(api_key)
+        revoked = (
+            await db.execute(
+                update(cls)
+                .filter((cls.api_key == hashed_key) & (cls.user_uid == user_uid))
+                .values(is_active=False)
+                .returning(cls.api_key)
+                .execution_options(synchronize_session=False)
+            )
+        ).first()
+        if not revoked:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="API key not found"
+            )
+        await db.commit()
+        api_key_cache.invalidate(hashed_key)
+
+    @classmethod
+    async def renew_key(
+            cls,
+            db: AsyncSession,
+            user_uid: str,
+            api_key: str,
+            new_expiration_date: str | None,
+    ) -> dict:
+        """
+        Renews an API key owned by user_uid and reactivates it if it was revoked.
+        Signed keys carry their expiry, so unless they never expire they are
+        reissued: the returned api_key replaces the renewed one and takes
+        over its usage history.
+        """
+        if new_expiration_date:
+            try:
+                expiration_time = datetime.fromisoformat(new_expiration_date)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="The expiration date could not be parsed. Please use ISO 8601.",
+                )
+            if expiration_time.tzinfo is None:
+                expiration_time = expiration_time.replace(tzinfo=UTC)
+        else:
+            expiration_time = datetime.now(UTC) + timedelta(hours=settings.default_apikey_ttl_hour)
+
+        hashed_key = cls.hash_api_key(api_key)
+        new_key = api_key_signer.issue(expiration_time) if api_key_signer.is_signed(api_key) else None
+        new_values = {
+            "is_active": True,
+            "expiration_time": expiration_time,
+            "api_key": case((cls.never_expire, cls.api_key),
+                            else_=cls.hash_api_key(new_key) if new_key else hashed_key),
+        }
+        owned = (cls.api_key == hashed_key) & (cls.user_uid == user_uid)
+        if db.get_bind().dialect.name == "postgresql":
+            # UPDATE ... FROM the row's previous state RETURNING it: one statement
+            previous = select(cls.api_key, cls.is_active, cls.expiration_time).filter(owned).subquery("previous")
+            row = (
+                await db.execute(
+                    update(cls)
+                    .where(cls.api_key == previous.c.api_key)
+                    .values(new_values)
+                    .returning(previous.c.is_active, previous.c.expiration_time, cls.never_expire)
+                    .execution_options(synchronize_session=False)
+                )
+            ).first()
+        else:
+            # SQLite cannot return columns of the FROM clause
+            row = (
+                await db.execute(select(cls.is_active, cls.expiration_time, cls.never_expire).filter(owned))
+            ).first()
+            if row:
+                await db.execute(
+                    update(cls).filter(owned)
+                    .values(new_values)
+                    .execution_options(synchronize_session=False)
+                )
         if not row:
-            return None
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="API key not found"
+            )
+        new_hashed_key = cls.hash_api_key(new_key) if new_key and not row.never_expire else None
+        if new_hashed_key:
+            # the usage history follows the key, as do increments not flushed yet
+            await db.execute(
+                update(APIKeyUsage).where(APIKeyUsage.api_key == hashed_key).values(api_key=new_hashed_key)
+            )
+            usage_writer.rename(hashed_key, new_hashed_key)
+        try:
+            await db.commit()
+        except Exception:
+            if new_hashed_key:
+                usage_writer.rename(hashed_key, None)
+            raise
+        api_key_cache.invalidate(hashed_key)
+
+        response_lines = []
+        if not row.is_active:
+            response_lines.append("This API key was revoked and has been reactivated.")
+        previous_expiration = row.expiration_time
+        if previous_expiration is not None and previous_expiration.tzinfo is None:
+            previous_expiration = previous_expiration.replace(tzinfo=UTC)
+        if not row.never_expire and previous_expiration < datetime.now(UTC):
+            response_lines.append("This API key was expired and is now renewed.")
 
-        # convert ORM object -> dict
-        response = {
-            "user_uid": row.user_uid,
-            "is_active": row.is_active,
-            "iam_roles": row.iam_roles,
-            "config": row.config,
-            "last_query_date": row.last_query_date,
+        return {
+            "message": " ".join(response_lines) if response_lines else None,
+            "api_key": None if row.never_expire else new_key,
         }
 
-        if not response["is_active"]:
+    @classmethod
+    async def check_key(
+            cls, db: AsyncSession, api_key: str, fallback_db: AsyncSession | None = None
+    ) -> dict | None:
+        """
+        Checks if an API key is valid (ORM style with Session).
+        Malformed, forged and expired signed keys are rejected by
+        api_key_signer before hashing; verified records are served from
+        api_key_cache when possible.
+
+        When db reads from a replica, signed keys it does not know as active
+        are looked up again through fallback_db, since they may have just been
+        created or renewed on the primary. Legacy keys are never new, so an
+        unknown uuid costs no primary query.
+        """
+        if not api_key_signer.check(api_key):
+            return None
+        hashed_key = cls.hash_api_key(api_key)
+        response = api_key_cache.get(hashed_key)
+        if response is MISSING:
+            query = select(cls).filter(
+                (cls.api_key == hashed_key) &
+                (cls.never_expire | (cls.expiration_time > datetime.now(UTC)))
+            )
+            row = (await db.execute(query)).scalars().first()
+            if (not row or not row.is_active) and fallback_db is not None \
+                    and api_key_signer.is_signed(api_key) \
+                    and db.get_bind() is not fallback_db.get_bind():
+                row = (await fallback_db.execute(query)).scalars().first()
+            if not row or not row.is_active:
+                api_key_cache.set_missing(hashed_key)
+                return None
+
+            # convert ORM object -> dict
+            response = {
+                "user_uid": row.user_uid,
+                "is_active": row.is_active,
+                "iam_roles": row.iam_roles,
+                "config": row.config,
+                "last_query_date": row.last_query_date,
+            }
+            api_key_cache.set(
+                hashed_key, response, None if row.never_expire else row.expiration_time
+            )
+        elif response is None:
             return None
 
         # cập nhật usage async
-        threading.Thread(target=cls._update_usage, args=(api_key,)).start()
+        usage_writer.record(hashed_key, response["user_uid"], datetime.now(UTC))
 
         return response
 
+class APIKeyUsage(Base):
+    """Requests of an API key per time bucket, written by usage_writer."""
+    __tablename__ = "api_key_usage"
+    __table_args__ = (
+        Index("ix_api_key_usage_user_uid_resolution_bucket", "user_uid", "resolution", "bucket"),
+        Index("ix_api_key_usage_resolution_bucket", "resolution", "bucket"),  # retention
+    )
+    api_key = Column(String, primary_key=True)
+    resolution = Column(Integer, primary_key=True)  # bucket width in seconds
+    bucket = Column(TIMESTAMP(timezone=True), primary_key=True)  # bucket start
+    user_uid = Column(String, nullable=False)  # kept once the key is swept
+    count = Column(Integer, nullable=False, default=0)
+
+
+api_key_crud = APIKey()
+
+
+# expired and revoked keys moved out of api_keys by the sweeper
+api_keys_archive = Table(
+    "api_keys_archive", Base.metadata,
+    Column("api_key", String, primary_key=True),
+    Column("name", String),
+    Column("user_uid", String, index=True),
+    Column("is_active", Boolean),
+    Column("never_expire", Boolean),
+    Column("expiration_time", TIMESTAMP(timezone=True), nullable=True),
+    Column("last_query_date", TIMESTAMP(timezone=True), nullable=True),
+    Column("total_queries", Integer),
+    Column("iam_roles", JSON),
+    Column("config", JSON),
+    Column("archived_at", TIMESTAMP(timezone=True), nullable=False, server_default=func.now()),
+)
+
+
+usage_writer = UsageWriter(
+    APIKey.__table__,
+    SessionLocal,
+    flush_interval=settings.usage_flush_interval_seconds,
+    flush_size=settings.usage_flush_size,
+    max_queue=settings.usage_queue_size,
+    usage_table=APIKeyUsage.__table__,
+    retention={
+        RESOLUTION_SECONDS["minute"]: timedelta(days=settings.usage_minute_retention_days),
+        RESOLUTION_SECONDS["hour"]: timedelta(days=settings.usage_hour_retention_days),
+        RESOLUTION_SECONDS["day"]: timedelta(days=settings.usage_day_retention_days),
+    },
+    prune_interval=settings.usage_prune_interval_seconds,
+)
+
 
-api_key_crud = APIKey()
\ No newline at end of file
+key_sweeper = KeySweeper(
+    APIKey.__table__,
+    api_keys_archive if settings.api_key_sweep_archive else None,
+    SessionLocal,
+    interval=settings.api_key_sweep_interval_seconds,
+    batch_size=settings.api_key_sweep_batch_size,
+    retention_days=settings.api_key_sweep_retention_days,
+)
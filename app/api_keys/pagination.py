@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from app import pagination
+
+
+def _parse(position: str) -> tuple[datetime | None, str]:
+    last_query_date, separator, hashed_key = position.partition("|")
+    if not separator or not hashed_key:
+        raise ValueError(position)
+    return (datetime.fromisoformat(last_query_date) if last_query_date else None), hashed_key
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, str]:
+    """(last_query_date, hashed_key) of the key the page ends with, in the listing order."""
+    return pagination.decode_cursor(cursor, _parse)
+
+
+def next_cursor(rows: list, limit: int) -> str | None:
+    return pagination.next_cursor(
+        rows, limit,
+        lambda row: f"{row.last_query_date.isoformat() if row.last_query_date else ''}|{row.api_key}",
+    )
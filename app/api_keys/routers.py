@@ -1,32 +1,29 @@
-import os
-
-
 from typing import Annotated
-from datetime import  datetime
+from datetime import  datetime, UTC, timedelta
 
 
-from fastapi import Request, Query, APIRouter, Depends, HTTPException, Security, status, Header
-from fastapi.security import HTTPBearer, APIKeyHeader, APIKeyQuery
+from fastapi import Request, Response, Query, APIRouter, Depends, HTTPException, Security, status, Header
+from fastapi.security import APIKeyHeader, APIKeyQuery
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 from pydantic import BaseModel, Json
 
 
-from jose import jwt
-
-
-from app.config import settings, rate_limiter
-from app.api_keys.models import api_key_crud
+from app.config import settings
+from app.api_keys.models import KeyStatus, Resolution, api_key_crud, usage_writer
+from app.api_keys.pagination import next_cursor
+from app.api_keys.cache import api_key_cache
+from app.auth.auth import get_current_user
 from app.auth.schemas import Authinfo, CheckKey
-from app.database import get_db
+from app.database import get_db, get_read_db
+from app.monitoring.context import timing
+from app.monitoring.routing import InstrumentedRoute
+from app.rate_limit.limiter import rate_limiter
 
 
-oauth2_bearer = HTTPBearer()
-
-
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 api_key_query = APIKeyQuery(
@@ -39,7 +36,7 @@ api_key_header = APIKeyHeader(
 
 @router.post("/new")
 async def get_new_api_key(
-    auth_info: Annotated[Authinfo, Depends(oauth2_bearer)],
+    auth_info: Annotated[Authinfo, Depends(get_current_user)],
     request: Request,
     name: Annotated[
         str,
@@ -59,19 +56,16 @@ async def get_new_api_key(
             description="if set, the created API key will never be considered expired",
         ),
     ] = False,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> str:
-    auth_header = request.headers.get('authorization')
-    token = auth_header[len("Bearer "):] if auth_header.startswith("Bearer ") else auth_header
-    payload = jwt.decode(token, os.getenv('SECRET_KEY'), algorithms='HS256')
     """
     Returns:
         api_key: a newly generated API key
     """
-    return api_key_crud.create_key(
+    return await api_key_crud.create_key(
         db= db,
         name = name,
-        user_uid = payload.get("uid"),
+        user_uid = auth_info.user_uid,
         never_expire = never_expires,
         iam_roles =['admin'],
         config= config or {},
@@ -80,20 +74,26 @@ async def get_new_api_key(
 
 @router.delete("/revoke")
 async def revoke_api_key(
-    auth_info: Annotated[Authinfo, Depends(oauth2_bearer)],
+    auth_info: Annotated[Authinfo, Depends(get_current_user)],
     api_key: Annotated[
         str, Query(..., alias="api-key", description="the api_key to revoke")
     ],
+    db: AsyncSession = Depends(get_db)
 ) -> None:
     """
     Revoke an API key associated with my account.
     """
-    return api_key_crud.revoke_key(auth_info.user_id, api_key)
+    return await api_key_crud.revoke_key(db, auth_info.user_uid, api_key)
+
+
+class RenewedKey(BaseModel):
+    message: str | None = None
+    api_key: str | None = None
 
 
-@router.patch("/renew")
+@router.patch("/renew", response_model=RenewedKey, response_model_exclude_none=True)
 async def renew_api_key(
-    auth_info: Annotated[Authinfo, Depends(oauth2_bearer)],
+    auth_info: Annotated[Authinfo, Depends(get_current_user)],
     api_key: Annotated[
         str, Query(..., alias="api-key", description="the API key to renew")
     ],
@@ -104,11 +104,20 @@ async def renew_api_key(
             description="the new expiration date in ISO format",
         ),
     ] = None,
-) -> str | None:
+    db: AsyncSession = Depends(get_db)
+) -> RenewedKey:
     """
     Renew an API key associated with my account, reactivate it if it was revoked.
+
+    A signed API key embeds its expiration date, so renewing it returns
+    a new api_key to use from now on; the renewed key stops working.
     """
-    return api_key_crud.renew_key(auth_info.user_id, api_key, expiration_date)
+    return await api_key_crud.renew_key(db, auth_info.user_uid, api_key, expiration_date)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Dates given without a timezone are taken as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=UTC)
 
 
 class UsageLog(BaseModel):
@@ -128,18 +137,38 @@ class UsageLog(BaseModel):
     response_model=list[UsageLog],
     response_model_exclude_none=True,
 )
-def get_api_key_usage_logs(
+async def get_api_key_usage_logs(
     request: Request,
-    auth_info: Annotated[Authinfo, Depends(oauth2_bearer)],
-    db: Session = Depends(get_db)
+    response: Response,
+    auth_info: Annotated[Authinfo, Depends(get_current_user)],
+    limit: Annotated[int, Query(ge=1, le=1000, description="number of keys per page")] = 100,
+    after: Annotated[
+        str | None,
+        Query(description="X-Next-Cursor header of the previous page"),
+    ] = None,
+    key_status: Annotated[
+        KeyStatus | None,
+        Query(alias="status", description="only active, expired or revoked keys"),
+    ] = None,
+    unused_since: Annotated[
+        datetime | None,
+        Query(alias="unused-since", description="only keys not used since this date, in ISO format"),
+    ] = None,
+    db: AsyncSession = Depends(get_read_db)
 ) -> list[UsageLog]:
-    auth_header = request.headers.get('authorization')
-    token = auth_header[len("Bearer "):] if auth_header.startswith("Bearer ") else auth_header
-    payload = jwt.decode(token, os.getenv('SECRET_KEY'), algorithms='HS256')
     """
-    Returns usage information for all API keys
+    Returns usage information for my API keys, most recently used first.
+    When more keys follow, the X-Next-Cursor response header holds the
+    value to pass as after to fetch them.
     """
-    # TODO Add some sort of filtering on older keys/unused keys?
+    if unused_since is not None:
+        unused_since = _as_utc(unused_since)
+    rows = await api_key_crud.get_usage_status(
+        db, auth_info.user_uid, limit, after, key_status, unused_since
+    )
+    cursor = next_cursor(rows, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
     return [
         UsageLog(
             api_key=row.api_key,
@@ -152,40 +181,97 @@ def get_api_key_usage_logs(
             iam_roles=row.iam_roles,
             config=row.config,
         )
-        for row in api_key_crud.get_usage_status(db,payload.get("uid"))
+        for row in rows
     ]
 
 
+class UsagePoint(BaseModel):
+    bucket: datetime
+    count: int
+
+
+class UsageSeries(BaseModel):
+    api_key: str | None = None
+    resolution: Resolution
+    start: datetime
+    end: datetime
+    total: int
+    points: list[UsagePoint]
+
+
+@router.get("/usage", response_model=UsageSeries, response_model_exclude_none=True)
+async def get_api_key_usage_series(
+    auth_info: Annotated[Authinfo, Depends(get_current_user)],
+    api_key: Annotated[
+        str | None,
+        Query(alias="api-key", description="api_key as returned by /list, all my keys when omitted"),
+    ] = None,
+    resolution: Annotated[Resolution, Query(description="bucket width")] = "hour",
+    start: Annotated[
+        datetime | None,
+        Query(description="in ISO format, defaults to one day before end"),
+    ] = None,
+    end: Annotated[datetime | None, Query(description="in ISO format, defaults to now")] = None,
+    db: AsyncSession = Depends(get_read_db)
+) -> UsageSeries:
+    """
+    Returns the number of requests made with my API keys per minute, hour or
+    day between start and end. Buckets without requests are left out, and
+    recent requests appear after the next usage flush.
+    """
+    end = _as_utc(end) if end else datetime.now(UTC)
+    start = _as_utc(start) if start else end - timedelta(days=1)
+    points = await api_key_crud.get_usage_series(
+        db, auth_info.user_uid, resolution, start, end, api_key
+    )
+    return UsageSeries(
+        api_key=api_key,
+        resolution=resolution,
+        start=start,
+        end=end,
+        total=sum(count for _, count in points),
+        points=[UsagePoint(bucket=bucket, count=count) for bucket, count in points],
+    )
+
+
 async def api_key_security(
+    request: Request,
     query_param: Annotated[str, Security(api_key_query)],
     header_param: Annotated[str, Security(api_key_header)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db),
+    primary_db: AsyncSession = Depends(get_db),
+):
+    return await _authenticate(request, query_param or header_param, db, primary_db)
+
+
+async def _authenticate(
+    request: Request, api_key: str | None, db: AsyncSession, primary_db: AsyncSession,
+    limit_scope: str = "key", default_rate: str | None = None,
 ):
-    if not query_param and not header_param:
+    if not api_key:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="An API key must be passed as query or header",
         )
 
-    key_info = api_key_crud.check_key(db, query_param or header_param)
+    # clients guessing keys are stopped before they reach the database
+    failures = f"auth-failures:{request.client.host if request.client else ''}"
+    await rate_limiter.check(failures, default=settings.rate_limit_failed_auth, consume=False)
+    with timing("auth_seconds"):
+        # keys unknown to a lagging replica are looked up again on the primary
+        key_info = await api_key_crud.check_key(db, api_key, fallback_db=primary_db)
 
-    if key_info:
-        return key_info
-    else:
+    if not key_info:
+        await rate_limiter.check(failures, default=settings.rate_limit_failed_auth)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Wrong, revoked, or expired API key."
         )
-
-
-
-def custom_rate_limiter(func):
-    """Customize the rate_limiter depending on our configuration."""
-    # If the env variable is not defined, don't use a rate limiter
-    if not settings.rate_limit:
-        return func
-    # Else return the check_api_key function decorated with
-    # the rate_limiter configured with our setting
-    return rate_limiter.limit(settings.rate_limit)(func)
+    # limited per key; a "rate_limit" entry in the key config overrides the default rate
+    await rate_limiter.check(
+        f"{limit_scope}:{api_key_crud.hash_api_key(api_key)}", (key_info["config"] or {}).get("rate_limit"),
+        default=default_rate,
+    )
+    return key_info
 
 
 @router.get(
@@ -193,11 +279,12 @@ def custom_rate_limiter(func):
     response_model=CheckKey,
     include_in_schema=settings.show_technical_endpoints,
 )
-@custom_rate_limiter
 async def check_api_key(
     request: Request,
     query_param: Annotated[str, Security(api_key_query)],
     header_param: Annotated[str, Security(api_key_header)],
+    db: AsyncSession = Depends(get_read_db),
+    primary_db: AsyncSession = Depends(get_db),
 ):
     """
     Check an API KEY validity in the database.
@@ -205,4 +292,34 @@ async def check_api_key(
     Todo:
         * Synchronize database with keycloak.
     """
-    return await api_key_security(query_param, header_param)
\ No newline at end of file
+    return await _authenticate(
+        request, query_param or header_param, db, primary_db,
+        limit_scope="check_key", default_rate=settings.rate_limit,
+    )
+
+
+@router.get(
+    "/cache_stats",
+    include_in_schema=settings.show_technical_endpoints,
+)
+def get_api_key_cache_stats(
+    auth_info: Annotated[Authinfo, Depends(get_current_user)],
+) -> dict:
+    """
+    Returns size and hit/miss counters of the in-process API key cache.
+    """
+    return api_key_cache.stats()
+
+
+@router.get(
+    "/usage_writer_stats",
+    include_in_schema=settings.show_technical_endpoints,
+)
+def get_usage_writer_stats(
+    auth_info: Annotated[Authinfo, Depends(get_current_user)],
+) -> dict:
+    """
+    Returns counters of the background API key usage writer,
+    including how many increments were coalesced into shared UPDATEs.
+    """
+    return usage_writer.stats()
@@ -0,0 +1,97 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+import uuid
+from datetime import datetime
+
+from app.config import settings
+
+
+PREFIX = "ak1"
+_ID_LENGTH = 22  # 16 random bytes, base64url
+_TAG_LENGTH = 22  # HMAC-SHA256 truncated to 16 bytes, base64url
+MAX_KEY_LENGTH = 64
+
+
+class APIKeySigner:
+    """
+    Issues and pre-checks self-describing API keys of the form
+
+        ak1.<key id>.<expiry, unix seconds in hex, 0 = never>.<HMAC tag>
+
+    check() rejects malformed, forged and expired keys in-process, so only
+    structurally valid keys cost a SHA-256 and a database lookup. Bare
+    uuid4 keys issued before this format pass while ``accept_legacy`` is on.
+    """
+
+    def __init__(self, secret: str, accept_legacy: bool):
+        if not secret:
+            raise ValueError("API keys cannot be signed with an empty secret")
+        self._secret = secret.encode()
+        self.accept_legacy = accept_legacy
+        self.signed = 0
+        self.legacy = 0
+        self.malformed = 0
+        self.forged = 0
+        self.expired = 0
+
+    def issue(self, expiration_time: datetime | None) -> str:
+        expiry = 0 if expiration_time is None else int(expiration_time.timestamp())
+        payload = f"{PREFIX}.{secrets.token_urlsafe(16)}.{expiry:x}"
+        return f"{payload}.{self._tag(payload)}"
+
+    @staticmethod
+    def is_signed(api_key: str) -> bool:
+        return api_key.startswith(PREFIX + ".")
+
+    def check(self, api_key: str) -> bool:
+        if self.is_signed(api_key):
+            parts = api_key.split(".")
+            if (len(api_key) > MAX_KEY_LENGTH or len(parts) != 4
+                    or len(parts[1]) != _ID_LENGTH or len(parts[3]) != _TAG_LENGTH):
+                self.malformed += 1
+                return False
+            try:
+                expiry = int(parts[2], 16)
+            except ValueError:
+                self.malformed += 1
+                return False
+            if not hmac.compare_digest(parts[3], self._tag(api_key[:-_TAG_LENGTH - 1])):
+                self.forged += 1
+                return False
+            if expiry and expiry <= time.time():
+                self.expired += 1
+                return False
+            self.signed += 1
+            return True
+        if self.accept_legacy and len(api_key) == 36:
+            try:
+                uuid.UUID(api_key)
+            except ValueError:
+                pass
+            else:
+                self.legacy += 1
+                return True
+        self.malformed += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "signed": self.signed,
+            "legacy": self.legacy,
+            "malformed": self.malformed,
+            "forged": self.forged,
+            "expired": self.expired,
+        }
+
+    def _tag(self, payload: str) -> str:
+        digest = hmac.new(self._secret, payload.encode(), hashlib.sha256).digest()[:16]
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+api_key_signer = APIKeySigner(
+    secret=settings.api_key_signing_secret or settings.SECRET_KEY,
+    accept_legacy=settings.api_key_accept_legacy,
+)
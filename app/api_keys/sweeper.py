@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, UTC, timedelta
+
+from sqlalchemy import Table, select, insert, delete, or_, and_
+
+
+logger = logging.getLogger(__name__)
+
+
+class KeySweeper:
+    """
+    Background thread that removes API keys which expired or were revoked more
+    than ``retention_days`` ago, optionally copying them to ``archive`` first.
+
+    Keys go in batches of ``batch_size``, each in its own short transaction,
+    so no sweep holds row locks for long. Rows locked by requests are skipped
+    (FOR UPDATE SKIP LOCKED on Postgres) and picked up by the next sweep.
+    """
+
+    def __init__(
+            self,
+            table: Table,
+            archive: Table | None,
+            session_factory,
+            interval: float,
+            batch_size: int,
+            retention_days: int,
+            pause: float = 0.05,
+    ):
+        self.table = table
+        self.archive = archive
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self.pause = pause
+        self.sweeps = 0
+        self.batches = 0
+        self.removed = 0
+        self.archived = 0
+        self.failures = 0
+        self.last_sweep_seconds = 0.0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    def start(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="api-key-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stops the sweeper thread; a running sweep ends after its current batch."""
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "batches": self.batches,
+            "removed": self.removed,
+            "archived": self.archived,
+            "failures": self.failures,
+            "last_sweep_seconds": self.last_sweep_seconds,
+        }
+
+    def sweep(self) -> int:
+        """Removes every sweepable key, batch by batch; returns how many were removed."""
+        started = time.perf_counter()
+        cutoff = datetime.now(UTC) - timedelta(days=self.retention_days)
+        removed = 0
+        while not self._stop.is_set():
+            count = self._sweep_batch(cutoff)
+            removed += count
+            if count < self.batch_size:
+                break
+            time.sleep(self.pause)  # let requests waiting on the table through
+        self.sweeps += 1
+        self.last_sweep_seconds = time.perf_counter() - started
+        return removed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info("Swept %d expired or revoked API keys", removed)
+            except Exception:
+                self.failures += 1
+                logger.exception("API key sweep failed")
+
+    def _sweepable(self, cutoff: datetime):
+        table = self.table
+        return or_(
+            and_(~table.c.never_expire, table.c.expiration_time < cutoff),
+            and_(~table.c.is_active,
+                 or_(table.c.last_query_date.is_(None), table.c.last_query_date < cutoff)),
+        )
+
+    def _sweep_batch(self, cutoff: datetime) -> int:
+        table = self.table
+        db = self.session_factory()
+        try:
+            batch = (
+                select(table.c.api_key)
+                .where(self._sweepable(cutoff))
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            keys = db.execute(batch).scalars().all()
+            if not keys:
+                return 0
+            if self.archive is not None:
+                columns = [column.name for column in table.c]
+                db.execute(
+                    insert(self.archive).from_select(
+                        columns,
+                        select(*(table.c[name] for name in columns)).where(table.c.api_key.in_(keys)),
+                    )
+                )
+            db.execute(delete(table).where(table.c.api_key.in_(keys)))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.batches += 1
+        self.removed += len(keys)
+        if self.archive is not None:
+            self.archived += len(keys)
+        return len(keys)
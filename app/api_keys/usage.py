@@ -0,0 +1,289 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, UTC, timedelta
+
+from sqlalchemy import (Table, Integer, String, TIMESTAMP, update, delete, values, column, bindparam,
+                        case, or_)
+
+
+logger = logging.getLogger(__name__)
+
+
+class UsageWriter:
+    """
+    Single background writer for API key usage counters.
+
+    Requests only enqueue (hashed_key, query_date). The writer thread sums the
+    increments per key, keeps the latest query date and writes them with one
+    bulk UPDATE every ``flush_interval`` seconds or once ``flush_size``
+    increments are pending.
+
+    When ``usage_table`` is given, the same flush also adds the requests of
+    each key per minute to its time buckets, one row per key, bucket width
+    (in seconds, the keys of ``retention``) and bucket start. Buckets older
+    than their retention are deleted every ``prune_interval`` seconds.
+
+    A key reissued by a renewal is announced with rename(); increments
+    recorded under the old key in the following ``RENAME_SECONDS`` are
+    written under the new one.
+    """
+
+    RENAME_SECONDS = 60
+
+    def __init__(
+            self,
+            table: Table,
+            session_factory,
+            flush_interval: float,
+            flush_size: int,
+            max_queue: int,
+            usage_table: Table | None = None,
+            retention: dict[int, timedelta] | None = None,
+            prune_interval: float = 3600,
+    ):
+        self.table = table
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.usage_table = usage_table
+        self.retention = {width: kept for width, kept in (retention or {}).items() if kept}
+        self.prune_interval = prune_interval
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.buckets_written = 0
+        self.buckets_pruned = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._renamed: dict[str, tuple[str, float]] = {}
+
+    def record(self, hashed_key: str, user_uid: str, query_date: datetime) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((hashed_key, user_uid, query_date))
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def rename(self, hashed_key: str, new_hashed_key: str | None) -> None:
+        """Writes the usage of hashed_key under new_hashed_key from now on; None undoes it."""
+        with self._lock:
+            if new_hashed_key is None:
+                self._renamed.pop(hashed_key, None)
+            else:
+                self._renamed[hashed_key] = (new_hashed_key, time.monotonic() + self.RENAME_SECONDS)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="api-key-usage-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stops the writer thread after flushing everything still queued."""
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "flushed_keys": self.written,
+            "flushes": self.flushes,
+            "coalesced": self.coalesced,
+            "buckets_written": self.buckets_written,
+            "buckets_pruned": self.buckets_pruned,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is None or self._pid != os.getpid():
+            self.start()
+
+    def _run(self) -> None:
+        pending: dict[str, list] = {}
+        minutes: Counter = Counter()
+        pending_count = 0
+        deadline = time.monotonic() + self.flush_interval
+        prune_deadline = time.monotonic()
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                hashed_key, user_uid, query_date = self._queue.get(timeout=min(timeout, 0.5))
+                entry = pending.get(hashed_key)
+                if entry is None:
+                    pending[hashed_key] = [1, query_date]
+                else:
+                    entry[0] += 1
+                    entry[1] = max(entry[1], query_date)
+                if self.retention:
+                    minutes[hashed_key, user_uid, int(query_date.timestamp()) // 60 * 60] += 1
+                pending_count += 1
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            if stopping and not self._queue.empty():
+                continue
+            if pending and (
+                    stopping or pending_count >= self.flush_size or time.monotonic() >= deadline
+            ):
+                self._flush(pending, minutes)
+                pending = {}
+                minutes = Counter()
+                pending_count = 0
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if stopping:
+                return
+            if self.retention and time.monotonic() >= prune_deadline:
+                self._prune()
+                prune_deadline = time.monotonic() + self.prune_interval
+
+    def _flush(self, pending: dict[str, list], minutes: Counter) -> None:
+        pending, minutes = self._rekey(pending, minutes)
+        rows = [(hashed_key, count, last) for hashed_key, (count, last) in pending.items()]
+        buckets = self._buckets(minutes)
+        db = self.session_factory()
+        try:
+            db.execute(*self._update_statement(db, rows))
+            if buckets:
+                db.execute(self._bucket_statement(db), buckets)
+            db.commit()
+            self.written += len(rows)
+            self.coalesced += sum(row[1] for row in rows) - len(rows)
+            self.buckets_written += len(buckets)
+            self.flushes += 1
+        except Exception:
+            db.rollback()
+            logger.exception("Could not flush usage of %d API keys", len(rows))
+        finally:
+            db.close()
+
+    def _rekey(self, pending: dict[str, list], minutes: Counter) -> tuple[dict[str, list], Counter]:
+        """Moves the increments of renamed keys to their current key."""
+        with self._lock:
+            now = time.monotonic()
+            self._renamed = {old: entry for old, entry in self._renamed.items() if entry[1] > now}
+            renamed = {old: new for old, (new, _) in self._renamed.items()}
+        if not renamed:
+            return pending, minutes
+
+        def current(hashed_key: str) -> str:
+            for _ in range(len(renamed)):  # a key renewed again within RENAME_SECONDS
+                if hashed_key not in renamed:
+                    break
+                hashed_key = renamed[hashed_key]
+            return hashed_key
+
+        merged: dict[str, list] = {}
+        for hashed_key, (count, last) in pending.items():
+            entry = merged.setdefault(current(hashed_key), [0, last])
+            entry[0] += count
+            entry[1] = max(entry[1], last)
+        rekeyed: Counter = Counter()
+        for (hashed_key, user_uid, minute), count in minutes.items():
+            rekeyed[current(hashed_key), user_uid, minute] += count
+        return merged, rekeyed
+
+    def _buckets(self, minutes: Counter) -> list[dict]:
+        """Rolls the per minute counts up into one row per key, bucket width and bucket start."""
+        counts: Counter = Counter()
+        for (hashed_key, user_uid, minute), count in minutes.items():
+            for width in self.retention:
+                counts[hashed_key, user_uid, width, minute // width * width] += count
+        return [
+            {
+                "api_key": hashed_key,
+                "user_uid": user_uid,
+                "resolution": width,
+                "bucket": datetime.fromtimestamp(start, UTC),
+                "count": count,
+            }
+            for (hashed_key, user_uid, width, start), count in counts.items()
+        ]
+
+    def _bucket_statement(self, db):
+        # INSERT ... ON CONFLICT DO UPDATE adds to buckets earlier flushes started
+        if db.get_bind().dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        table = self.usage_table
+        statement = insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.api_key, table.c.resolution, table.c.bucket],
+            set_={"count": table.c.count + statement.excluded.count},
+        )
+
+    def _prune(self) -> None:
+        table = self.usage_table
+        now = datetime.now(UTC)
+        db = self.session_factory()
+        try:
+            for width, kept in self.retention.items():
+                result = db.execute(
+                    delete(table).where(table.c.resolution == width, table.c.bucket < now - kept)
+                )
+                db.commit()  # one short transaction per resolution
+                self.buckets_pruned += result.rowcount
+        except Exception:
+            db.rollback()
+            logger.exception("Could not prune API key usage buckets")
+        finally:
+            db.close()
+
+    def _update_statement(self, db, rows: list[tuple]) -> tuple:
+        table = self.table
+        if db.get_bind().dialect.name == "postgresql":
+            # UPDATE api_keys SET ... FROM (VALUES ...) AS usage: one statement for the whole batch
+            usage = values(
+                column("hashed_key", String),
+                column("increment", Integer),
+                column("last_query", TIMESTAMP(timezone=True)),
+                name="usage",
+            ).data(rows)
+            return (
+                update(table)
+                .where(table.c.api_key == usage.c.hashed_key)
+                .values(
+                    total_queries=table.c.total_queries + usage.c.increment,
+                    last_query_date=case(
+                        (or_(table.c.last_query_date.is_(None),
+                             table.c.last_query_date < usage.c.last_query),
+                         usage.c.last_query),
+                        else_=table.c.last_query_date,
+                    ),
+                ),
+            )
+        last_query = bindparam("last_query")
+        return (
+            update(table)
+            .where(table.c.api_key == bindparam("hashed_key"))
+            .values(
+                total_queries=table.c.total_queries + bindparam("increment"),
+                last_query_date=case(
+                    (or_(table.c.last_query_date.is_(None), table.c.last_query_date < last_query),
+                     last_query),
+                    else_=table.c.last_query_date,
+                ),
+            ),
+            [
+                {"hashed_key": hashed_key, "increment": count, "last_query": last}
+                for hashed_key, count, last in rows
+            ],
+        )
@@ -1,23 +1,25 @@
-import os
 from datetime import timedelta, datetime, timezone
 from typing import Annotated
 
-from fastapi.security import HTTPBearer, OAuth2PasswordRequestForm, APIKeyQuery, APIKeyHeader
+from fastapi.security import (HTTPBearer, HTTPAuthorizationCredentials, OAuth2PasswordRequestForm,
+                              APIKeyQuery, APIKeyHeader)
 from fastapi import Depends, HTTPException, status, APIRouter, Security
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth.schemas import Token
+from app.auth.schemas import Token, Authinfo
+from app.auth.cache import token_cache
+from app.auth.hashing import password_hasher
+from app.config import settings
 from app.database import get_db
 from app.users.models import User
-from app.api_keys.models import api_key_crud
+from app.monitoring.context import timing
+from app.monitoring.routing import InstrumentedRoute
+from app.rate_limit.limiter import rate_limiter
 
-from jose import jwt, JWTError, ExpiredSignatureError
-from passlib.context import CryptContext
 
+router = APIRouter(route_class=InstrumentedRoute)
 
-router = APIRouter()
-
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 oauth2_bearer = HTTPBearer()
 
 
@@ -29,43 +31,82 @@ api_key_header = APIKeyHeader(
 )
 
 
-def authenticate_user(usernane:str, password: str, db: Session):
-    user = db.query(User).filter(User.username == usernane).first()
+async def authenticate_user(usernane:str, password: str, db: AsyncSession):
+    user = (await db.execute(select(User).filter(User.username == usernane))).scalars().first()
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.password):
+    if not await password_hasher.verify(password, user.password):
         return False
     return user
 
 
 def create_access_token(uid: str, expires_delta: timedelta):
+    from jose import jwt
+
     encode = {'uid': uid}
     expires = datetime.now(timezone.utc) + expires_delta
     encode.update({'exp': expires})
-    return jwt.encode(encode, os.getenv('SECRET_KEY'), algorithm='HS256')
+    return jwt.encode(encode, settings.SECRET_KEY, algorithm='HS256')
+
 
+async def get_current_user(
+        token: Annotated[HTTPAuthorizationCredentials, Depends(oauth2_bearer)]
+) -> Authinfo:
+    """
+    Verifies the bearer token once per request; verified payloads are
+    served from token_cache until the token expires. Requests are rate
+    limited per user uid.
+    """
+    with timing("auth_seconds"):
+        auth_info = token_cache.get(token.credentials)
+        if auth_info is None:
+            auth_info = _verify_token(token.credentials)
+    await rate_limiter.check(f"user:{auth_info.user_uid}")
+    return auth_info
+
+
+def _verify_token(token: str) -> Authinfo:
+    # jose is imported on first use: it accounts for a sizeable share of the app import time
+    from jose import jwt, JWTError, ExpiredSignatureError
 
-def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
     try:
-        payload = jwt.decode(token.credentials, os.getenv('SECRET_KEY'), algorithms='HS256')
-        username: str = payload.get('username')
-        if username is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-                                detail='Could not validate user.')
-        return {'username': username}
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
     except ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Token is expired")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail='Could not validate user.')
+    uid: str = payload.get('uid')
+    if uid is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                            detail='Could not validate user.')
+    auth_info = Authinfo(user_uid=uid, roles=payload.get('roles', []))
+    token_cache.set(token, auth_info, payload.get('exp'))
+    return auth_info
 
 
 @router.post("/token", response_model=Token)
-async def login_access_token(requests:OAuth2PasswordRequestForm= Depends(), db: Session=Depends(get_db)):
-    user = authenticate_user(usernane=requests.username, password=requests.password, db=db)
+async def login_access_token(requests:OAuth2PasswordRequestForm= Depends(), db: AsyncSession=Depends(get_db)):
+    user = await authenticate_user(usernane=requests.username, password=requests.password, db=db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail= "Could not validate user")
     token = create_access_token(user.uid, timedelta(minutes=20))
-    return {'access_token': token, 'token_type': 'bearer'}
\ No newline at end of file
+    return {'access_token': token, 'token_type': 'bearer'}
+
+
+@router.get("/hashing_stats", include_in_schema=settings.show_technical_endpoints)
+def get_hashing_stats(auth_info: Annotated[Authinfo, Depends(get_current_user)]) -> dict:
+    """
+    Returns queue depth, rejections, hash latency and queue wait of the password hasher.
+    """
+    return password_hasher.stats()
+
+
+@router.get("/token_cache_stats", include_in_schema=settings.show_technical_endpoints)
+def get_token_cache_stats(auth_info: Annotated[Authinfo, Depends(get_current_user)]) -> dict:
+    """
+    Returns size and hit/miss counters of the verified token cache.
+    """
+    return token_cache.stats()
@@ -0,0 +1,23 @@
+import time
+
+from app.auth.schemas import Authinfo
+from app.cache import MISSING, TTLCache
+from app.config import settings
+
+
+class TokenCache(TTLCache):
+    """
+    Bounded LRU cache of verified JWT payloads, keyed by the raw token.
+    An entry never outlives the token's exp claim.
+    """
+
+    def get(self, token: str) -> Authinfo | None:
+        auth_info = super().get(token)
+        return None if auth_info is MISSING else auth_info
+
+    def set(self, token: str, auth_info: Authinfo, exp: float | None) -> None:
+        ttl = self.ttl if exp is None else min(self.ttl, exp - time.time())
+        self.put(token, auth_info, ttl)
+
+
+token_cache = TokenCache(maxsize=settings.token_cache_size, ttl=settings.token_cache_ttl_seconds)
@@ -0,0 +1,177 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import cache
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.monitoring.context import timing
+
+
+@cache
+def bcrypt_context():
+    """Built on first use, which only happens in the pool processes."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=['bcrypt'], deprecated='auto')
+
+
+def _hash(password: str) -> str:
+    return bcrypt_context().hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return bcrypt_context().verify(password, hashed)
+
+
+def _run(func, *args):
+    """Runs in the pool process; returns the result with its start time and duration."""
+    started = time.time()
+    result = func(*args)
+    return result, started, time.time() - started
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a process pool so that it neither
+    blocks the event loop nor contends for the GIL.
+
+    At most ``max_pending`` operations may be queued or running; further calls
+    are rejected immediately with 503 instead of piling up behind the pool.
+
+    When a pool process dies (OOM kill, segfault) the pool is replaced and
+    the operations it broke are retried once on the new one.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.count = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+        self.queue_wait_seconds_total = 0.0
+        self.queue_wait_seconds_max = 0.0
+        self._executor: ProcessPoolExecutor | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self._bulk_semaphore: tuple[asyncio.AbstractEventLoop, asyncio.Semaphore] | None = None
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit(_verify, password, hashed)
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        """
+        Hashes a batch, one job per password, with at most workers - 1 of
+        them (at least one) queued or running at a time. Logins thus find a
+        free process or wait for a single hash, never behind a whole batch.
+        Bulk jobs wait for a slot instead of being rejected, but still count
+        towards the pending operations seen by logins.
+        """
+        if not passwords:
+            return []
+        slots = self._bulk_slots()
+
+        async def hash_one(password: str) -> str:
+            async with slots:
+                return await self._submit(_hash, password, enforce_cap=False)
+
+        return list(await asyncio.gather(*(hash_one(password) for password in passwords)))
+
+    def shutdown(self) -> None:
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "count": self.count,
+            "hash_seconds_total": self.hash_seconds_total,
+            "hash_seconds_max": self.hash_seconds_max,
+            "queue_wait_seconds_total": self.queue_wait_seconds_total,
+            "queue_wait_seconds_max": self.queue_wait_seconds_max,
+        }
+
+    def _bulk_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._bulk_semaphore is None or self._bulk_semaphore[0] is not loop:
+            self._bulk_semaphore = (loop, asyncio.Semaphore(max(1, self.workers - 1)))
+        return self._bulk_semaphore[1]
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> None:
+        """Drops broken unless an operation it also broke already replaced it."""
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self.restarts += 1
+
+    async def _run_in_pool(self, func, *args):
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, _run, func, *args)
+            except BrokenProcessPool:
+                self._replace_executor(executor)
+                if attempt:
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Password hashing is unavailable, retry later",
+                        headers={"Retry-After": "1"},
+                    )
+
+    async def _submit(self, func, *args, enforce_cap: bool = True):
+        if enforce_cap and self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent password operations, retry later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        submitted = time.time()
+        try:
+            with timing("hash_seconds"):
+                result, started, duration = await self._run_in_pool(func, *args)
+        finally:
+            self.pending -= 1
+
+        queue_wait = max(0.0, started - submitted)
+        self.count += 1
+        self.hash_seconds_total += duration
+        self.hash_seconds_max = max(self.hash_seconds_max, duration)
+        self.queue_wait_seconds_total += queue_wait
+        self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, queue_wait)
+        return result
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
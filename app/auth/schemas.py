@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from datetime import datetime
 from pydantic import BaseModel
 
 
@@ -20,7 +21,7 @@ class Authinfo:
 
 
 class CheckKey(BaseModel):
-    user_id: str
-    user_login: str
+    user_uid: str
     iam_roles: list | None
-    config: dict | None
\ No newline at end of file
+    config: dict | None
+    last_query_date: datetime | None = None
@@ -1,29 +1,86 @@
 from pydantic_settings import BaseSettings
 from pydantic import  field_validator
 
-from dotenv import load_dotenv
-
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-
-
-load_dotenv()
-
 
 class Settings(BaseSettings):
-    POSTGRES_HOSTNAME: str
+    POSTGRES_HOSTNAME: str = "db"
     POSTGRES_USER: str = ""
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
-    DATABASE_PORT: int
-    SECRET_KEY: str = ""
+    DATABASE_PORT: int = 5432
+    SECRET_KEY: str  # required: signs access tokens and, by default, API keys
+    DATABASE_URL: str = ""  # overrides the POSTGRES_* settings when set
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_sync_pool_size: int = 2  # sync engine, used by the usage writer and sweeper threads
+    db_sync_max_overflow: int = 1
+    db_pool_timeout: float = 30  # seconds to wait for a connection
+    db_pool_recycle: int = 1800  # seconds, -1 disables
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 0  # 0 disables
+    db_echo: bool = False
+    db_slow_query_ms: int = 0  # log statements slower than this, 0 disables
+    db_n_plus_one_threshold: int = 10  # same statement more often than this per request
+    db_replica_urls: str = ""  # comma separated, read-only endpoints read from these
+    db_replica_check_interval_seconds: float = 5
+    db_replica_max_lag_seconds: float = 10  # 0 disables the lag check
+    db_read_your_writes_seconds: float = 5  # a writer reads from the primary this long
     root_path: str = ""
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 0  # 0 means one per available CPU core
+    server_preload: bool = True  # import the app before forking gunicorn workers
+    server_backlog: int = 2048  # pending connections queued by the kernel
+    server_keep_alive_seconds: int = 5  # keep above the idle timeout of a load balancer in front
+    server_graceful_timeout_seconds: int = 30  # requests in flight may finish on SIGTERM
     default_apikey_ttl_hour: int = 15 * 24  # in hours
+    api_key_signing_secret: str = ""  # HMAC key of issued API keys, SECRET_KEY when empty
+    api_key_accept_legacy: bool = True  # accept bare uuid4 keys during the migration window
     cors_origins_regex: str = ".*"
     cors_allow_methods: str = "*"
-    rate_limit: str = "20/minute"
+    rate_limit: str = "20/minute"  # /check_key per API key, empty disables
+    rate_limit_routes: str = "100/second"  # other authenticated routes per API key or user, empty disables
+    rate_limit_failed_auth: str = "30/minute"  # unknown API keys per client address, empty disables
+    # memory (single worker), shm (one host) or redis; app.server uses shm when unset and running several workers
+    rate_limit_backend: str = "memory"
+    rate_limit_redis_url: str = "redis://localhost:6379/0"
+    rate_limit_shm_path: str = "/dev/shm/crud-fastapi-rate-limit"
+    rate_limit_shm_slots: int = 65536
     show_technical_endpoints: bool = False
     use_authlib_oauth: bool = True
+    apikey_cache_size: int = 4096  # 0 disables the cache
+    # per worker: other workers keep accepting a revoked or renewed key for up to this long
+    apikey_cache_ttl_seconds: int = 5
+    apikey_negative_cache_ttl_seconds: int = 5
+    token_cache_size: int = 4096  # 0 disables the cache
+    token_cache_ttl_seconds: int = 300
+    usage_flush_interval_seconds: float = 1.0
+    usage_flush_size: int = 1000
+    usage_queue_size: int = 100_000
+    usage_minute_retention_days: float = 2  # per key usage buckets, 0 stops recording them
+    usage_hour_retention_days: float = 90
+    usage_day_retention_days: float = 730
+    usage_prune_interval_seconds: float = 3600
+    usage_series_max_points: int = 10_000  # buckets per usage query
+    api_key_sweep_interval_seconds: float = 3600  # 0 disables the sweeper
+    api_key_sweep_batch_size: int = 500  # keys per transaction
+    api_key_sweep_retention_days: int = 30  # after expiry or revocation
+    api_key_sweep_archive: bool = True  # copy swept keys to api_keys_archive
+    password_hash_workers: int = 0  # 0 means one per CPU core
+    password_hash_max_pending: int = 64
+    user_import_batch_size: int = 1000
+    user_import_max_errors: int = 1000  # rows reported individually, the rest are only counted
+    user_import_max_line_bytes: int = 1 << 20  # longer rows are reported as errors and skipped
+    user_batch_max_size: int = 1000  # ids per batch get/update/delete request
+    user_response_cache_size: int = 1024  # 0 disables the cache
+    user_response_cache_ttl_seconds: int = 10  # bounds staleness across workers
+
+    @field_validator("SECRET_KEY")
+    def require_secret_key(cls, v):
+        """An empty key would let anyone sign tokens for any user."""
+        if not v.strip():
+            raise ValueError("SECRET_KEY must not be empty")
+        return v
 
     @field_validator("cors_allow_methods")
     def parse_cors_allow_methods(cls, v):
@@ -40,6 +97,3 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
-
-
-rate_limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
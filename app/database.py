@@ -1,30 +1,162 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from app.config import settings
+from app.monitoring.pool import TimedQueuePool, TimedAsyncAdaptedQueuePool
+from app.monitoring.sql import instrument_engine
+from app.replicas import ReplicaSet
 
 
-POSTGRES_URL = (
-    f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@db"
-    f":{settings.DATABASE_PORT}/{settings.POSTGRES_DB}"
-)
+SYNC_DRIVERS = {"postgresql": "postgresql+psycopg2", "sqlite": "sqlite"}
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def database_url() -> URL:
+    """DATABASE_URL if set, otherwise the URL built from the POSTGRES_* settings."""
+    if settings.DATABASE_URL:
+        return make_url(settings.DATABASE_URL)
+    return URL.create(
+        "postgresql",
+        username=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        host=settings.POSTGRES_HOSTNAME,
+        port=settings.DATABASE_PORT,
+        database=settings.POSTGRES_DB,
+    )
+
+
+def replica_urls() -> list[URL]:
+    return [make_url(url.strip()) for url in settings.db_replica_urls.split(",") if url.strip()]
+
+
+def with_driver(url: URL, drivers: dict[str, str]) -> URL:
+    backend = url.get_backend_name()
+    return url.set(drivername=drivers.get(backend, url.drivername))
+
+
+def engine_options(url: URL, is_async: bool) -> dict:
+    options = {"echo": settings.db_echo}
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return options
+    options.update(
+        poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.db_pool_size if is_async else settings.db_sync_pool_size,
+        max_overflow=settings.db_max_overflow if is_async else settings.db_sync_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    if backend == "postgresql" and settings.db_statement_timeout_ms:
+        if is_async:
+            options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}
+            }
+        else:
+            options["connect_args"] = {
+                "options": f"-c statement_timeout={settings.db_statement_timeout_ms}"
+            }
+    return options
+
 
+POSTGRES_URL = with_driver(database_url(), SYNC_DRIVERS)
+ASYNC_POSTGRES_URL = with_driver(database_url(), ASYNC_DRIVERS)
 
-# Create the engine
-engine = create_engine(
-    POSTGRES_URL,
-    echo=True
+
+# Create the engine (sync, for scripts and background threads)
+engine = create_engine(POSTGRES_URL, **engine_options(POSTGRES_URL, is_async=False))
+
+# Create the async engine used by the request handlers
+async_engine = create_async_engine(ASYNC_POSTGRES_URL, **engine_options(ASYNC_POSTGRES_URL, is_async=True))
+
+
+# Async engines of the read replicas, used by read-only endpoints
+replica_engines = [
+    create_async_engine(url, **engine_options(url, is_async=True))
+    for url in (with_driver(url, ASYNC_DRIVERS) for url in replica_urls())
+]
+
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+for replica_engine in replica_engines:
+    instrument_engine(replica_engine.sync_engine)
+
+
+replicas = ReplicaSet(
+    async_engine,
+    replica_engines,
+    check_interval=settings.db_replica_check_interval_seconds,
+    max_lag=settings.db_replica_max_lag_seconds,
+    read_your_writes=settings.db_read_your_writes_seconds,
+    secret=settings.SECRET_KEY,
 )
 
 
+class PrimarySession(Session):
+    """Session of get_db; a commit after writes starts the client's read-your-writes window."""
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _note_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _remember_writer(session):
+    request = session.info.get("request")
+    if session.info.pop("wrote", False) and request is not None:
+        request.state.db_wrote = True  # ReadYourWritesMiddleware sets the read-primary cookie
+
+
+class ReadSession(Session):
+    """Session of get_read_db, bound on first use to the engine replicas picks for the request."""
+
+    def get_bind(self, mapper=None, **kw):
+        bind = self.info.get("read_engine")
+        if bind is None:
+            request = self.info.get("request")
+            bind = replicas.read_engine(request).sync_engine
+            self.info["read_engine"] = bind
+        return bind
+
+
 # Create the session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, sync_session_class=PrimarySession,
+    autoflush=False, expire_on_commit=False,
+)
+ReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession, sync_session_class=ReadSession, autoflush=False, expire_on_commit=False
+)
 
 # Create declarative base
 Base = declarative_base()
 
 # Dependency to get DB session
-def get_db():
+async def get_db(request: Request):
+    async with AsyncSessionLocal(info={"request": request}) as db:
+        yield db
+
+
+# Dependency of read-only endpoints: a replica, or the primary as described in app.replicas
+async def get_read_db(request: Request):
+    async with ReadSessionLocal(info={"request": request}) as db:
+        yield db
+
+
+# Sync session, for scripts
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
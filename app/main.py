@@ -1,21 +1,25 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-
-from dotenv import load_dotenv
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
 
 from app.auth import auth as auth_routers
-from app.users import models, routers as user_routers
+from app.users import routers as user_routers
 from app.api_keys import routers as api_key_routers
-from app.database import engine
-from app.config import rate_limiter
-from slowapi.errors import RateLimitExceeded
-from slowapi import  _rate_limit_exceeded_handler
-
+from app.api_keys.models import usage_writer, key_sweeper
+from app.monitoring import routers as monitoring_routers
+from app.monitoring.collectors import register_collectors
+from app.monitoring.middleware import TimingMiddleware
+from app.auth.hashing import password_hasher
+from app.database import engine, async_engine, replicas
+from app.rate_limit.limiter import rate_limiter
+from app.replicas import ReadYourWritesMiddleware
 
-models.Base.metadata.create_all(bind=engine)
 
-
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 
 origins = {
@@ -23,20 +27,50 @@ origins = {
 }
 
 
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """
+    Sets up the worker's resources once it is serving, and releases them in
+    reverse order on shutdown. The schema is managed by ``python -m app.migrate``.
+    """
+    try:
+        # open the first pooled connection now rather than on the first request
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    except Exception:
+        logger.exception("Database is not reachable at startup")
+    replicas.start()
+    usage_writer.start()
+    key_sweeper.start()
+    yield
+    key_sweeper.stop()
+    usage_writer.stop()  # flushes the queued usage through the sync engine
+    password_hasher.shutdown()
+    await rate_limiter.close()
+    await replicas.close()
+    await async_engine.dispose()
+    engine.dispose()
+
+
 def get_application() -> FastAPI:
-    application = FastAPI()
+    application = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
     application.add_middleware(
         CORSMiddleware,
         allow_origins=['*'],
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # cursor of the next page of GET /api/api-key/list
+        expose_headers=["X-Next-Cursor"],
     )
-    application.state.limiter = rate_limiter
-    application.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+    application.add_middleware(TimingMiddleware)
+    application.add_middleware(ReadYourWritesMiddleware, replica_set=replicas)
     application.include_router(user_routers.router, tags=['Users'], prefix='/api/users')
     application.include_router(auth_routers.router, tags=['Auth'], prefix='/api/auth')
     application.include_router(api_key_routers.router, tags=['Api-key'], prefix='/api/api-key')
+    application.include_router(monitoring_routers.router, tags=['Monitoring'], prefix='/api/monitoring')
+    application.add_route('/metrics', monitoring_routers.metrics, include_in_schema=False)
+    register_collectors()
     return application
 
 
@@ -0,0 +1,97 @@
+"""
+Versioned schema migrations.
+
+Migrations are the modules of app/migrations named NNNN_description.py,
+each with an upgrade(connection) function. They are applied in order, each
+in its own transaction, and recorded in the schema_migrations table. Run
+once per deployment, before starting the workers:
+
+    python -m app.migrate            # apply pending migrations
+    python -m app.migrate --status   # list applied and pending migrations
+"""
+import argparse
+import importlib
+import pkgutil
+import re
+from datetime import datetime, UTC
+from pathlib import Path
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, TIMESTAMP, select, text
+from sqlalchemy.engine import Engine
+
+
+MIGRATIONS_PACKAGE = "app.migrations"
+MIGRATIONS_PATH = Path(__file__).parent / "migrations"
+_MIGRATION_NAME = re.compile(r"^(\d{4})_\w+$")
+
+# arbitrary key of the Postgres advisory lock serializing concurrent runs
+ADVISORY_LOCK_ID = 7_413_921
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", TIMESTAMP(timezone=True), nullable=False),
+)
+
+
+def available_migrations() -> list[tuple[int, str]]:
+    migrations = []
+    for module in pkgutil.iter_modules([str(MIGRATIONS_PATH)]):
+        match = _MIGRATION_NAME.match(module.name)
+        if match:
+            migrations.append((int(match.group(1)), module.name))
+    return sorted(migrations)
+
+
+def applied_versions(engine: Engine) -> set[int]:
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine: Engine, target: int | None = None) -> list[str]:
+    """Applies the pending migrations up to target (all by default) and returns their names."""
+    applied = []
+    with engine.connect() as lock_connection:
+        is_postgres = engine.dialect.name == "postgresql"
+        if is_postgres:
+            lock_connection.execute(text(f"SELECT pg_advisory_lock({ADVISORY_LOCK_ID})"))
+        try:
+            done = applied_versions(engine)
+            for version, name in available_migrations():
+                if version in done or (target is not None and version > target):
+                    continue
+                module = importlib.import_module(f"{MIGRATIONS_PACKAGE}.{name}")
+                with engine.begin() as connection:
+                    module.upgrade(connection)
+                    connection.execute(schema_migrations.insert().values(
+                        version=version, name=name, applied_at=datetime.now(UTC)
+                    ))
+                applied.append(name)
+        finally:
+            if is_postgres:
+                lock_connection.execute(text(f"SELECT pg_advisory_unlock({ADVISORY_LOCK_ID})"))
+                lock_connection.commit()
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the database schema migrations.")
+    parser.add_argument("--target", type=int, help="stop after this migration version")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+    args = parser.parse_args()
+
+    from app.database import engine
+
+    if args.status:
+        done = applied_versions(engine)
+        for version, name in available_migrations():
+            print(f"{'applied' if version in done else 'pending'}  {name}")
+        return
+    applied = upgrade(engine, args.target)
+    print("\n".join(f"applied  {name}" for name in applied) or "database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Users and API keys tables, as created by metadata.create_all before migrations existed."""
+from sqlalchemy import (MetaData, Table, Column, Integer, String, Boolean, TIMESTAMP, JSON,
+                        ForeignKey, func)
+from sqlalchemy.engine import Connection
+
+
+metadata = MetaData()
+
+users = Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("username", String, unique=True, nullable=False),
+    Column("password", String(60), nullable=False),
+    Column("uid", String, unique=True, nullable=False),
+    Column("first_name", String, nullable=True),
+    Column("last_name", String, nullable=True),
+    Column("createdAt", TIMESTAMP(timezone=True), nullable=True, server_default=func.now()),
+    Column("updatedAt", TIMESTAMP(timezone=True), nullable=True, server_default=func.now()),
+)
+
+api_keys = Table(
+    "api_keys", metadata,
+    Column("api_key", String, primary_key=True, index=True),
+    Column("name", String),
+    Column("user_uid", String, ForeignKey("users.uid")),
+    Column("is_active", Boolean),
+    Column("never_expire", Boolean),
+    Column("expiration_time", TIMESTAMP(timezone=True), nullable=True, server_default=func.now()),
+    Column("last_query_date", TIMESTAMP(timezone=True), nullable=True, server_default=func.now()),
+    Column("total_queries", Integer),
+    Column("iam_roles", JSON),
+    Column("config", JSON),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    # checkfirst adopts databases created by the former import-time create_all
+    metadata.create_all(connection, checkfirst=True)
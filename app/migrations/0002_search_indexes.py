@@ -0,0 +1,24 @@
+"""pg_trgm GIN indexes for user search (Postgres only)."""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+
+def upgrade(connection: Connection) -> None:
+    if connection.dialect.name != "postgresql":
+        return
+    # without the extension, searches fall back to sequential scans
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except DBAPIError:
+        return
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (username gin_trgm_ops)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_users_first_name_trgm ON users USING gin (first_name gin_trgm_ops)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_users_last_name_trgm ON users USING gin (last_name gin_trgm_ops)"
+    ))
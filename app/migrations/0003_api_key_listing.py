@@ -0,0 +1,39 @@
+"""Index for listing a user's API keys by usage, and the archive of swept keys."""
+from sqlalchemy import (MetaData, Table, Column, Integer, String, Boolean, TIMESTAMP, JSON,
+                        Index, func)
+from sqlalchemy.engine import Connection
+
+
+metadata = MetaData()
+
+api_keys = Table(
+    "api_keys", metadata,
+    Column("api_key", String, primary_key=True),
+    Column("user_uid", String),
+    Column("last_query_date", TIMESTAMP(timezone=True)),
+)
+
+# not CONCURRENTLY: every migration runs inside its own transaction
+user_uid_last_query_date = Index(
+    "ix_api_keys_user_uid_last_query_date", api_keys.c.user_uid, api_keys.c.last_query_date
+)
+
+api_keys_archive = Table(
+    "api_keys_archive", metadata,
+    Column("api_key", String, primary_key=True),
+    Column("name", String),
+    Column("user_uid", String, index=True),
+    Column("is_active", Boolean),
+    Column("never_expire", Boolean),
+    Column("expiration_time", TIMESTAMP(timezone=True), nullable=True),
+    Column("last_query_date", TIMESTAMP(timezone=True), nullable=True),
+    Column("total_queries", Integer),
+    Column("iam_roles", JSON),
+    Column("config", JSON),
+    Column("archived_at", TIMESTAMP(timezone=True), nullable=False, server_default=func.now()),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    user_uid_last_query_date.create(connection, checkfirst=True)
+    api_keys_archive.create(connection, checkfirst=True)
@@ -0,0 +1,21 @@
+"""Per key usage buckets (minute, hour and day), fed by the usage writer."""
+from sqlalchemy import MetaData, Table, Column, Integer, String, TIMESTAMP, Index
+from sqlalchemy.engine import Connection
+
+
+metadata = MetaData()
+
+api_key_usage = Table(
+    "api_key_usage", metadata,
+    Column("api_key", String, primary_key=True),
+    Column("resolution", Integer, primary_key=True),
+    Column("bucket", TIMESTAMP(timezone=True), primary_key=True),
+    Column("user_uid", String, nullable=False),
+    Column("count", Integer, nullable=False),
+    Index("ix_api_key_usage_user_uid_resolution_bucket", "user_uid", "resolution", "bucket"),
+    Index("ix_api_key_usage_resolution_bucket", "resolution", "bucket"),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    api_key_usage.create(connection, checkfirst=True)
@@ -0,0 +1,51 @@
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+from prometheus_client.registry import Collector
+
+from app.api_keys.cache import api_key_cache
+from app.api_keys.models import usage_writer, key_sweeper
+from app.api_keys.signing import api_key_signer
+from app.auth.cache import token_cache
+from app.auth.hashing import password_hasher
+from app.database import engine, async_engine, replicas
+from app.users.cache import user_response_cache
+from app.monitoring.pool import pool_status
+
+
+def _flatten(prefix: str, stats: dict):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(f"{prefix}_{key}", value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}_{key}", value
+
+
+class AppStatsCollector(Collector):
+    """Publishes the in-process stats() of caches, background workers and pools as gauges."""
+
+    sources = {
+        "api_key_cache": api_key_cache.stats,
+        "api_key_signer": api_key_signer.stats,
+        "token_cache": token_cache.stats,
+        "user_response_cache": user_response_cache.stats,
+        "usage_writer": usage_writer.stats,
+        "key_sweeper": key_sweeper.stats,
+        "password_hasher": password_hasher.stats,
+        "db_pool_async": lambda: pool_status(async_engine.sync_engine),
+        "db_pool_sync": lambda: pool_status(engine),
+        "db_replicas": replicas.stats,
+    }
+
+    def collect(self):
+        for prefix, stats in self.sources.items():
+            for name, value in _flatten(prefix, stats()):
+                yield GaugeMetricFamily(name, f"{prefix} stats()", value=value)
+
+
+_registered = False
+
+
+def register_collectors() -> None:
+    global _registered
+    if not _registered:
+        REGISTRY.register(AppStatsCollector())
+        _registered = True
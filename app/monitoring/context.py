@@ -0,0 +1,52 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RequestStats:
+    """Per-request counters, shared by reference with threadpool workers."""
+    route: str = "unrouted"
+    statements: int = 0
+    db_seconds: float = 0.0
+    auth_seconds: float = 0.0
+    hash_seconds: float = 0.0
+    serialization_seconds: float = 0.0
+    endpoint_finished: float | None = None
+    statement_counts: dict[str, int] = field(default_factory=dict)
+
+    def server_timing(self, total_seconds: float) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.2f}"
+            for name, seconds in (
+                ("db", self.db_seconds),
+                ("auth", self.auth_seconds),
+                ("bcrypt", self.hash_seconds),
+                ("serialize", self.serialization_seconds),
+                ("total", total_seconds),
+            )
+        )
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current_route() -> str:
+    stats = request_stats.get()
+    return stats.route if stats is not None else "background"
+
+
+@contextmanager
+def timing(name: str):
+    """Adds the duration of the block to the current request's <name> counter."""
+    stats = request_stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, name, getattr(stats, name) + time.perf_counter() - started)
@@ -0,0 +1,32 @@
+from prometheus_client import Counter, Histogram
+
+
+sql_statement_seconds = Histogram(
+    "sql_statement_seconds",
+    "Latency of SQL statements, per normalized statement and calling route",
+    ["statement", "route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+sql_statement_rows = Histogram(
+    "sql_statement_rows",
+    "Rows returned or affected by SQL statements, per normalized statement",
+    ["statement"],
+    buckets=(0, 1, 10, 100, 1000, 10000, 100000),
+)
+sql_statements_per_request = Histogram(
+    "sql_statements_per_request",
+    "Number of SQL statements executed while handling a request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+sql_n_plus_one_total = Counter(
+    "sql_n_plus_one_total",
+    "Requests that executed the same statement more than the N+1 threshold",
+    ["statement", "route"],
+)
+http_request_seconds = Histogram(
+    "http_request_seconds",
+    "Total time spent handling HTTP requests, per route and status code",
+    ["route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
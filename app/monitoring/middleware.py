@@ -0,0 +1,48 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.monitoring.context import RequestStats, request_stats
+from app.monitoring.metrics import http_request_seconds
+from app.monitoring.sql import observe_request
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware timing each HTTP request.
+
+    Adds a Server-Timing header splitting the time to the response start into
+    db, auth, bcrypt and serialization, and feeds the per-route latency
+    histogram once the response is complete.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            http_request_seconds.labels(stats.route, str(status_code)).observe(
+                time.perf_counter() - started
+            )
+            observe_request(stats)
+            request_stats.reset(token)
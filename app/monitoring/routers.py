@@ -0,0 +1,37 @@
+from typing import Annotated
+
+import anyio.to_thread
+from fastapi import APIRouter, Depends, Request, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from app.auth.auth import get_current_user
+from app.auth.schemas import Authinfo
+from app.config import settings
+from app.database import engine, async_engine
+from app.monitoring.pool import pool_status
+from app.monitoring.routing import InstrumentedRoute
+
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.get("/pool", include_in_schema=settings.show_technical_endpoints)
+async def get_pool_status(auth_info: Annotated[Authinfo, Depends(get_current_user)]) -> dict:
+    """
+    Returns checked-out and idle connections, overflow usage and checkout wait
+    times of both engines, next to the usage of Starlette's threadpool.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "async_engine": pool_status(async_engine.sync_engine),
+        "sync_engine": pool_status(engine),
+        "threadpool": {
+            "total": limiter.total_tokens,
+            "borrowed": limiter.borrowed_tokens,
+        },
+    }
+
+
+async def metrics(request: Request) -> Response:
+    """Prometheus scrape endpoint, registered at /metrics by get_application()."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
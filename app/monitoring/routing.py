@@ -0,0 +1,56 @@
+import asyncio
+import functools
+import time
+from typing import Callable, Coroutine, Any
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from app.monitoring.context import request_stats
+
+
+def _mark_endpoint_finished() -> None:
+    stats = request_stats.get()
+    if stats is not None:
+        stats.endpoint_finished = time.perf_counter()
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    APIRoute that labels the current RequestStats with the route template,
+    e.g. "GET /api/users/{userId}", and times the response serialization:
+    everything between the endpoint returning and the Response being built.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def timed_call(**kwargs):
+                try:
+                    return await call(**kwargs)
+                finally:
+                    _mark_endpoint_finished()
+        else:
+            @functools.wraps(call)
+            def timed_call(**kwargs):
+                try:
+                    return call(**kwargs)
+                finally:
+                    _mark_endpoint_finished()
+        self.dependant.call = timed_call
+
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def instrumented_handler(request: Request) -> Response:
+            stats = request_stats.get()
+            if stats is None:
+                return await handler(request)
+            stats.route = f"{request.method} {route}"
+            response = await handler(request)
+            if stats.endpoint_finished is not None:
+                stats.serialization_seconds += time.perf_counter() - stats.endpoint_finished
+            return response
+
+        return instrumented_handler
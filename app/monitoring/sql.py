@@ -0,0 +1,64 @@
+import logging
+import re
+import time
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.monitoring.context import RequestStats, request_stats, current_route
+from app.monitoring.metrics import (sql_statement_seconds, sql_statement_rows,
+                                    sql_statements_per_request, sql_n_plus_one_total)
+
+
+logger = logging.getLogger("app.sql.slow")
+
+_PLACEHOLDER = re.compile(r"\$\d+(::(TIMESTAMP WITH(OUT)? TIME ZONE|\w+)(\[\])?)?|%\(\w+\)s|%s|\?")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(\s*,\s*\?)+\s*\)")
+_VALUES = re.compile(r"(VALUES\s*\(\.\.\.\))(\s*,\s*\(\.\.\.\))+", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement: str) -> str:
+    """Collapses placeholders, literals and IN/VALUES lists so that equivalent statements share a label."""
+    statement = _SPACES.sub(" ", statement).strip()
+    statement = _LITERAL.sub("?", _PLACEHOLDER.sub("?", statement))
+    statement = _LIST.sub("(...)", statement)
+    return _VALUES.sub(r"\1", statement)[:300]
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Records latency, rows and per-request counts of every statement run on engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        normalized = normalize_statement(statement)
+        route = current_route()
+        sql_statement_seconds.labels(normalized, route).observe(elapsed)
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            sql_statement_rows.labels(normalized).observe(cursor.rowcount)
+
+        stats = request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+            stats.statement_counts[normalized] = stats.statement_counts.get(normalized, 0) + 1
+
+        if settings.db_slow_query_ms and elapsed * 1000 >= settings.db_slow_query_ms:
+            logger.warning("slow query (%.1f ms, route %s): %s", elapsed * 1000, route, statement)
+
+
+def observe_request(stats: RequestStats) -> None:
+    """Publishes the statement count of a finished request and flags N+1 patterns."""
+    sql_statements_per_request.labels(stats.route).observe(stats.statements)
+    for statement, count in stats.statement_counts.items():
+        if count > settings.db_n_plus_one_threshold:
+            sql_n_plus_one_total.labels(statement, stats.route).inc()
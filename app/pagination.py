@@ -0,0 +1,28 @@
+import base64
+import binascii
+from typing import Any, Callable, TypeVar
+
+from fastapi import HTTPException, status
+
+
+T = TypeVar("T")
+
+
+def encode_cursor(position: str) -> str:
+    """Opaque cursor carrying position, the sort key of the last row of a page."""
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, parse: Callable[[str], T]) -> T:
+    """The position of cursor through parse; 400 when either fails or raises ValueError."""
+    try:
+        return parse(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def next_cursor(rows: list, limit: int, position: Callable[[Any], str]) -> str | None:
+    """Cursor for the following page, or None when rows is the last page."""
+    if len(rows) < limit or not rows:
+        return None
+    return encode_cursor(position(rows[-1]))
@@ -0,0 +1,134 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+class MemoryBackend:
+    """Per-process GCRA state. Only correct with a single worker."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tats: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, interval: float, period: float, consume: bool = True) -> float:
+        with self._lock:
+            now = time.time()
+            tat = max(self._tats.get(key, now), now)
+            allow_at = tat + interval - period
+            if now < allow_at or not consume:
+                return max(0.0, allow_at - now)
+            self._tats[key] = tat + interval
+            if len(self._tats) > self.max_keys:
+                self._tats = {k: v for k, v in self._tats.items() if v > now}
+            return 0.0
+
+    async def close(self) -> None:
+        pass
+
+
+class SharedMemoryBackend:
+    """
+    GCRA state in a memory-mapped file shared by all workers of one host.
+
+    The file is a fixed table of (key fingerprint, TAT) slots with linear
+    probing; when a probe window is full, the slot with the oldest TAT is
+    reused. Updates are serialized with flock on the file.
+    """
+
+    SLOT = struct.Struct("<Qd")
+    PROBES = 16
+
+    def __init__(self, path: str, slots: int):
+        self.path = path
+        self.slots = slots
+        self._mmap: mmap.mmap | None = None
+        self._fd: int | None = None
+        self._pid: int | None = None
+
+    def _open(self) -> mmap.mmap:
+        if self._mmap is None or self._pid != os.getpid():
+            size = self.slots * self.SLOT.size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._fd, self._mmap, self._pid = fd, mmap.mmap(fd, size), os.getpid()
+        return self._mmap
+
+    async def hit(self, key: str, interval: float, period: float, consume: bool = True) -> float:
+        table = self._open()
+        fingerprint = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        start = fingerprint % self.slots
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            now = time.time()
+            slot, victim, victim_tat = None, start, float("inf")
+            for probe in range(self.PROBES):
+                index = (start + probe) % self.slots
+                stored, tat = self.SLOT.unpack_from(table, index * self.SLOT.size)
+                if stored == fingerprint:
+                    slot = index
+                    break
+                if stored == 0 or tat < victim_tat:
+                    victim, victim_tat = index, (-1.0 if stored == 0 else tat)
+            if slot is None:
+                slot, tat = victim, now
+            tat = max(tat, now)
+            allow_at = tat + interval - period
+            if now < allow_at or not consume:
+                return max(0.0, allow_at - now)
+            self.SLOT.pack_into(table, slot * self.SLOT.size, fingerprint, tat + interval)
+            return 0.0
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    async def close(self) -> None:
+        if self._mmap is not None and self._pid == os.getpid():
+            self._mmap.close()
+            os.close(self._fd)
+        self._mmap = self._fd = None
+
+
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local consume = ARGV[3] == '1'
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local allow_at = tat + interval - period
+if now < allow_at then
+  return tostring(allow_at - now)
+end
+if not consume then
+  return '0'
+end
+redis.call('SET', KEYS[1], tostring(tat + interval), 'PX', math.ceil((tat + interval - now) * 1000))
+return '0'
+"""
+
+
+class RedisBackend:
+    """
+    GCRA state in Redis, shared by every worker and host. The whole check runs
+    in one Lua script using the server clock, so it is atomic and immune to
+    clock skew between app hosts. Works with any Redis-protocol server.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio
+
+        self.prefix = prefix
+        self._client = redis.asyncio.Redis.from_url(url)
+        self._script = self._client.register_script(GCRA_SCRIPT)
+
+    async def hit(self, key: str, interval: float, period: float, consume: bool = True) -> float:
+        return float(await self._script(keys=[self.prefix + key], args=[interval, period, int(consume)]))
+
+    async def close(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,90 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.rate_limit.backends import MemoryBackend, SharedMemoryBackend, RedisBackend
+
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RATE = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Rate:
+    limit: int
+    period: float
+
+    @property
+    def interval(self) -> float:
+        """GCRA emission interval: one request every interval seconds, bursts of up to limit."""
+        return self.period / self.limit
+
+
+@lru_cache(maxsize=256)
+def parse_rate(value: str) -> Rate:
+    """Parses "20/minute", "100 per hour" or "5/10 seconds"."""
+    match = _RATE.match(value)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid rate limit: {value!r}")
+    count, multiplier, unit = match.groups()
+    return Rate(int(count), int(multiplier or 1) * PERIODS[unit.lower()])
+
+
+def create_backend():
+    if settings.rate_limit_backend == "redis":
+        return RedisBackend(settings.rate_limit_redis_url)
+    if settings.rate_limit_backend == "shm":
+        return SharedMemoryBackend(settings.rate_limit_shm_path, settings.rate_limit_shm_slots)
+    return MemoryBackend()
+
+
+class RateLimiter:
+    """
+    GCRA rate limiter keyed by the authenticated principal (API key or user uid).
+    The state lives in a pluggable backend, so limits hold across workers
+    when the shm or redis backend is used.
+    """
+
+    def __init__(self, default_rate: str):
+        self.default_rate = parse_rate(default_rate) if default_rate else None
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = create_backend()
+        return self._backend
+
+    async def check(self, key: str, rate: str | None = None, default: str | None = None,
+                    consume: bool = True) -> None:
+        """
+        Raises 429 with Retry-After when key exceeded rate, or else default
+        ("" disables) or the default rate of the limiter. Unless consume, only
+        checks whether the next request would be rejected.
+        """
+        limit = self.default_rate if default is None else parse_rate(default) if default else None
+        if rate:
+            try:
+                limit = parse_rate(rate)
+            except ValueError:
+                pass
+        if limit is None:
+            return
+        retry_after = await self.backend.hit(key, limit.interval, limit.period, consume)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded: {limit.limit} per {limit.period:g} seconds",
+                headers={"Retry-After": str(max(1, round(retry_after)))},
+            )
+
+    async def close(self) -> None:
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
+
+
+rate_limiter = RateLimiter(settings.rate_limit_routes)
@@ -0,0 +1,217 @@
+"""
+Read replica routing.
+
+Read-only endpoints take their session from ``get_read_db``; it binds to a
+replica chosen round-robin among the healthy ones, or to the primary when
+there are none.
+
+A response to a request that committed a write on the primary carries a
+signed ``read-primary`` cookie valid for ``read_your_writes`` seconds; the
+client's requests bearing it read from the primary, whichever worker or
+host serves them. Clients that drop cookies only get this within the
+request that wrote.
+
+Any database can stand in for a replica, which is how this is exercised
+locally: migrate two databases, point DATABASE_URL at one and
+DB_REPLICA_URLS at the other, and reads of other clients see the second
+one's contents while a writer sees its own writes.
+"""
+import asyncio
+import hashlib
+import hmac
+import itertools
+import logging
+import math
+import time
+from functools import partial
+
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+# seconds the replica is behind; 0 when caught up, even if the primary was idle since
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+READ_PRIMARY_COOKIE = "read-primary"
+
+
+class ReplicaSet:
+    """
+    The primary engine and the replica engines reads may be sent to.
+
+    A background task checks every replica each ``check_interval`` seconds
+    and takes it out of rotation when it cannot be reached within
+    ``check_timeout`` or lags more than ``max_lag`` seconds (0 disables the
+    lag check); a disconnect seen by a request does so immediately.
+    """
+
+    def __init__(
+            self,
+            primary: AsyncEngine,
+            replicas: list[AsyncEngine],
+            check_interval: float,
+            max_lag: float,
+            read_your_writes: float,
+            secret: str,
+            check_timeout: float = 2.0,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.max_lag = max_lag
+        self.read_your_writes = read_your_writes
+        self._secret = secret.encode()
+        self.healthy = [True] * len(replicas)
+        self.lag_seconds: list[float | None] = [None] * len(replicas)
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.pinned = 0
+        self.fallbacks = 0
+        self.failed_checks = 0
+        self.cookies_issued = 0
+        self._next = itertools.count()
+        self._task: asyncio.Task | None = None
+        for index, replica in enumerate(replicas):
+            event.listen(replica.sync_engine, "handle_error", partial(self._on_error, index))
+
+    def read_engine(self, request: Request | None) -> AsyncEngine:
+        """The engine to read from on behalf of request."""
+        if not self.replicas:
+            self.primary_reads += 1
+            return self.primary
+        if request is not None and self.reads_primary(request):
+            self.pinned += 1
+            return self.primary
+        healthy = [replica for replica, ok in zip(self.replicas, self.healthy) if ok]
+        if not healthy:
+            self.fallbacks += 1
+            return self.primary
+        self.replica_reads += 1
+        return healthy[next(self._next) % len(healthy)]
+
+    def reads_primary(self, request: Request) -> bool:
+        """Whether request wrote, or carries an unexpired read-primary cookie."""
+        if not self.replicas or not self.read_your_writes:
+            return False
+        if getattr(request.state, "db_wrote", False):
+            return True
+        cookie = request.cookies.get(READ_PRIMARY_COOKIE)
+        if not cookie:
+            return False
+        until, _, tag = cookie.partition(".")
+        if not until.isdigit() or not hmac.compare_digest(tag, self._tag(until)):
+            return False
+        return int(until) > time.time() * 1000
+
+    def cookie(self) -> str:
+        """Set-Cookie value pinning the client's reads to the primary for read_your_writes seconds."""
+        self.cookies_issued += 1
+        until = str(int((time.time() + self.read_your_writes) * 1000))  # milliseconds
+        return (f"{READ_PRIMARY_COOKIE}={until}.{self._tag(until)}; "
+                f"Max-Age={math.ceil(self.read_your_writes)}; Path=/; HttpOnly; SameSite=Lax")
+
+    def start(self) -> None:
+        if self.replicas and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.dispose()
+
+    async def check(self) -> None:
+        """Checks every replica once and updates which ones receive reads."""
+        await asyncio.gather(*(self._check(index) for index in range(len(self.replicas))))
+
+    def stats(self) -> dict:
+        return {
+            "replicas": len(self.replicas),
+            "healthy": sum(self.healthy),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "pinned": self.pinned,
+            "fallbacks": self.fallbacks,
+            "failed_checks": self.failed_checks,
+            "cookies_issued": self.cookies_issued,
+            "lag_seconds": {str(index): lag for index, lag in enumerate(self.lag_seconds)},
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    async def _check(self, index: int) -> None:
+        replica = self.replicas[index]
+        try:
+            lag = await asyncio.wait_for(self._lag(replica), self.check_timeout)
+        except Exception as e:
+            self.failed_checks += 1
+            lag = None
+            healthy = False
+            reason = f"{type(e).__name__}: {e}"
+        else:
+            healthy = not self.max_lag or lag <= self.max_lag
+            reason = f"lag {lag:.1f}s"
+        if healthy != self.healthy[index]:
+            logger.warning("Replica %d (%s) is %s, %s", index, replica.url.render_as_string(),
+                           "back in rotation" if healthy else "out of rotation", reason)
+        self.healthy[index] = healthy
+        self.lag_seconds[index] = lag
+
+    @staticmethod
+    async def _lag(replica: AsyncEngine) -> float:
+        async with replica.connect() as connection:
+            if replica.dialect.name == "postgresql":
+                return float(await connection.scalar(POSTGRES_LAG_QUERY))
+            await connection.execute(text("SELECT 1"))
+            return 0.0
+
+    def _tag(self, until: str) -> str:
+        return hmac.new(self._secret, until.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def _on_error(self, index: int, context) -> None:
+        if context.is_disconnect and self.healthy[index]:
+            logger.warning("Replica %d is out of rotation after a disconnect", index)
+            self.healthy[index] = False
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware adding the read-primary cookie to the responses of
+    requests whose database session committed a write (see get_db).
+    """
+
+    def __init__(self, app: ASGIApp, replica_set: ReplicaSet):
+        self.app = app
+        self.replica_set = replica_set
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.replica_set.replicas or not self.replica_set.read_your_writes:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and scope.get("state", {}).get("db_wrote"):
+                message["headers"] = [
+                    *message.get("headers", []), (b"set-cookie", self.replica_set.cookie().encode("latin-1"))
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,152 @@
+"""
+Production entry point, replacing ``uvicorn app.main:app --reload``:
+
+    python -m app.server                 # workers from server_workers or the CPU quota
+    python -m app.server --workers 4 --port 8080
+
+With gunicorn installed and more than one worker, gunicorn manages uvicorn
+workers and, with server_preload, imports the application once in the
+master so the workers share its memory copy-on-write. Otherwise uvicorn
+runs the workers itself, each importing the application. uvloop and
+httptools are used when installed.
+
+On SIGTERM the workers stop accepting connections and let the requests in
+flight finish for up to server_graceful_timeout_seconds; the lifespan then
+flushes the usage writer and closes the pools.
+"""
+import argparse
+import importlib.util
+import logging
+import math
+import os
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+APP = "app.main:app"
+
+
+def available_cores() -> int:
+    """CPUs this process may run on, bounded by the cgroup CPU quota of a container."""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+def worker_count(requested: int = 0) -> int:
+    return requested or settings.server_workers or available_cores()
+
+
+def event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def share_cores(workers: int) -> None:
+    """
+    Splits the bcrypt pool between the workers instead of giving every worker
+    one hashing process per core, and moves rate limits to a backend shared
+    by the workers; must run before app.main is imported.
+    """
+    if workers < 2:
+        return
+    if not settings.password_hash_workers:
+        settings.password_hash_workers = max(1, available_cores() // workers)
+        # uvicorn's workers are spawned and read the settings again
+        os.environ["PASSWORD_HASH_WORKERS"] = str(settings.password_hash_workers)
+    rate_limited = settings.rate_limit or settings.rate_limit_routes or settings.rate_limit_failed_auth
+    if rate_limited and settings.rate_limit_backend == "memory":
+        if "rate_limit_backend" in settings.model_fields_set:
+            raise SystemExit(f"rate_limit_backend=memory would give every key {workers} times its "
+                             f"rate limit with {workers} workers, use shm or redis")
+        settings.rate_limit_backend = "shm"
+        os.environ["RATE_LIMIT_BACKEND"] = "shm"
+        logger.info("Rate limits are shared by the workers through %s", settings.rate_limit_shm_path)
+
+
+def connections_per_worker() -> int:
+    """Most database connections one worker opens, over the primary and the replicas."""
+    replicas = len([url for url in settings.db_replica_urls.split(",") if url.strip()])
+    return ((1 + replicas) * (settings.db_pool_size + settings.db_max_overflow)
+            + settings.db_sync_pool_size + settings.db_sync_max_overflow)
+
+
+def run_gunicorn(host: str, port: int, workers: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for name, value in {
+                "bind": f"{host}:{port}",
+                "workers": workers,
+                # loop and http "auto": uvloop and httptools when installed
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                "preload_app": settings.server_preload,
+                "backlog": settings.server_backlog,
+                "keepalive": settings.server_keep_alive_seconds,
+                # workers still serving requests this long after SIGTERM are killed
+                "graceful_timeout": settings.server_graceful_timeout_seconds,
+            }.items():
+                self.cfg.set(name, value)
+
+        def load(self):
+            from app.main import app
+
+            return app
+
+    Application().run()
+
+
+def run_uvicorn(host: str, port: int, workers: int) -> None:
+    import uvicorn
+
+    uvicorn.run(
+        APP,
+        host=host,
+        port=port,
+        workers=workers,
+        loop=event_loop(),
+        http=http_protocol(),
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keep_alive_seconds,
+        timeout_graceful_shutdown=settings.server_graceful_timeout_seconds,
+        proxy_headers=True,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the API with production settings.")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=0, help="defaults to server_workers or the CPU count")
+    args = parser.parse_args(argv)
+    logging.basicConfig()
+    logger.setLevel(logging.INFO)
+
+    workers = worker_count(args.workers)
+    share_cores(workers)
+    use_gunicorn = workers > 1 and importlib.util.find_spec("gunicorn") is not None
+    logger.info(
+        "Starting %d worker(s) with %s, loop=%s http=%s, up to %d database connections per worker",
+        workers, "gunicorn" if use_gunicorn else "uvicorn", event_loop(), http_protocol(),
+        connections_per_worker(),
+    )
+    if use_gunicorn:
+        run_gunicorn(args.host, args.port, workers)
+    else:
+        run_uvicorn(args.host, args.port, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, delete, values, column, bindparam, Integer
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.users.models import User
+from app.users.queries import select_public
+from app.users.schemas import UserBatchUpdateItem
+
+
+users = User.__table__
+
+
+def _check_unique(ids: list[int]) -> None:
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Each id may appear only once per batch")
+
+
+async def get_many(db: AsyncSession, ids: list[int]) -> list[dict]:
+    """Fetches every id with one SELECT ... WHERE id IN (...)."""
+    found = {
+        row.id: row
+        for row in (await db.execute(select_public().filter(User.id.in_(ids)))).all()
+    }
+    return [
+        {"id": user_id, "status": "found", "user": found[user_id]} if user_id in found
+        else {"id": user_id, "status": "missing"}
+        for user_id in ids
+    ]
+
+
+async def update_many(db: AsyncSession, items: list[UserBatchUpdateItem]) -> list[dict]:
+    """
+    Applies partial updates with one statement per distinct set of updated
+    fields (usually one) and a single commit. On Postgres the statement is an
+    UPDATE ... FROM (VALUES ...) RETURNING id; elsewhere an executemany
+    UPDATE, preceded by a SELECT of the ids that exist.
+    """
+    ids = [item.id for item in items]
+    _check_unique(ids)
+    groups: dict[tuple[str, ...], list[dict]] = {}
+    for item in items:
+        data = item.model_dump(exclude_unset=True, exclude={"id"})
+        groups.setdefault(tuple(sorted(data)), []).append({"id": item.id, **data})
+
+    updated = set()
+    if db.get_bind().dialect.name == "postgresql":
+        for fields, rows in groups.items():
+            batch = values(
+                column("id", Integer),
+                *(column(field, users.c[field].type) for field in fields),
+                name="batch",
+            ).data([(row["id"], *(row[field] for field in fields)) for row in rows])
+            updated.update((await db.execute(
+                update(users)
+                .where(users.c.id == batch.c.id)
+                .values({field: batch.c[field] for field in fields})
+                .returning(users.c.id)
+            )).scalars())
+    else:
+        updated.update((await db.execute(
+            select(User.id).filter(User.id.in_(ids))
+        )).scalars())
+        for fields, rows in groups.items():
+            await db.execute(
+                update(users)
+                .where(users.c.id == bindparam("batch_id"))
+                .values({field: bindparam(f"new_{field}") for field in fields}),
+                [{"batch_id": row["id"], **{f"new_{field}": row[field] for field in fields}}
+                 for row in rows],
+            )
+    await db.commit()
+    return [{"id": user_id, "status": "updated" if user_id in updated else "missing"} for user_id in ids]
+
+
+async def delete_many(db: AsyncSession, ids: list[int]) -> list[dict]:
+    """Deletes every id with one DELETE ... WHERE id IN (...) RETURNING id."""
+    _check_unique(ids)
+    try:
+        deleted = set((await db.execute(
+            delete(users).where(users.c.id.in_(ids)).returning(users.c.id)
+        )).scalars())
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Some of these users still own API keys, nothing was deleted")
+    return [{"id": user_id, "status": "deleted" if user_id in deleted else "missing"} for user_id in ids]
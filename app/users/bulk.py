@@ -0,0 +1,194 @@
+import csv
+import json
+import time
+import uuid
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.hashing import password_hasher
+from app.config import settings
+from app.users.models import User
+from app.users.schemas import UserCrateSchema
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int) -> AsyncIterator[str | None]:
+    """
+    Splits a byte stream into text lines, holding at most max_length bytes of
+    the current line; a longer line is skipped up to its end and yields None.
+    """
+    pending: list[bytes] = []
+    pending_length = 0
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            piece = chunk[start:end]
+            start = end + 1
+            if skipping or pending_length + len(piece) > max_length:
+                yield None
+            else:
+                pending.append(piece)
+                yield b"".join(pending).decode("utf-8", errors="replace").rstrip("\r")
+            pending, pending_length, skipping = [], 0, False
+        if not skipping and start < len(chunk):
+            pending_length += len(chunk) - start
+            if pending_length > max_length:
+                pending, pending_length, skipping = [], 0, True
+            else:
+                pending.append(chunk[start:])
+    if skipping:
+        yield None
+    elif pending:
+        yield b"".join(pending).decode("utf-8", errors="replace").rstrip("\r")
+
+
+async def iter_rows(chunks: AsyncIterator[bytes], is_csv: bool) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    Yields (row number, row) from an NDJSON or CSV body, or (row number, error)
+    for lines that cannot be parsed or are longer than
+    user_import_max_line_bytes. CSV records must fit on one line and the first
+    line is the header.
+    """
+    header = None
+    row_number = 0
+    async for line in iter_lines(chunks, settings.user_import_max_line_bytes):
+        if line is None:
+            row_number += 1
+            yield row_number, f"line longer than {settings.user_import_max_line_bytes} bytes"
+            continue
+        if not line.strip():
+            continue
+        if is_csv:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = values
+                continue
+            row_number += 1
+            if len(values) != len(header):
+                yield row_number, f"expected {len(header)} columns, got {len(values)}"
+            else:
+                yield row_number, dict(zip(header, values))
+        else:
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield row_number, f"invalid JSON: {e}"
+                continue
+            yield row_number, row if isinstance(row, dict) else "expected a JSON object"
+
+
+def _insert(db: AsyncSession):
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(User)
+
+
+class UserImport:
+    """
+    Creates users in batches: the passwords of a batch are hashed in parallel
+    in the password hasher pool, then the batch is written with one multi-row
+    INSERT ... ON CONFLICT (username) DO NOTHING RETURNING username and
+    committed. Usernames missing from RETURNING already existed.
+    """
+
+    def __init__(self, db: AsyncSession, batch_size: int, max_errors: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: list[dict] = []
+        self.hash_seconds = 0.0
+        self.insert_seconds = 0.0
+        self._batch: list[tuple[int, UserCrateSchema]] = []
+
+    async def add(self, row_number: int, row: dict | str) -> None:
+        self.rows += 1
+        if isinstance(row, str):
+            self._error(row_number, None, row)
+            return
+        try:
+            user = UserCrateSchema.model_validate(row)
+        except ValidationError as e:
+            self._error(row_number, row.get("username"), "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+            ))
+            return
+        self._batch.append((row_number, user))
+        if len(self._batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+
+        first_rows: dict[str, int] = {}
+        unique = []
+        for row_number, user in batch:
+            if user.username in first_rows:
+                self.duplicates += 1
+                self._error(row_number, user.username,
+                            f"duplicate of row {first_rows[user.username]}", invalid=False)
+            else:
+                first_rows[user.username] = row_number
+                unique.append(user)
+
+        started = time.perf_counter()
+        hashed = await password_hasher.hash_many([user.password for user in unique])
+        self.hash_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        statement = _insert(self.db).values([
+            {"username": user.username, "password": password, "uid": str(uuid.uuid4())}
+            for user, password in zip(unique, hashed)
+        ]).on_conflict_do_nothing(index_elements=[User.username]).returning(User.username)
+        inserted = set((await self.db.execute(statement)).scalars().all())
+        await self.db.commit()
+        self.insert_seconds += time.perf_counter() - started
+
+        self.created += len(inserted)
+        for user in unique:
+            if user.username not in inserted:
+                self.duplicates += 1
+                self._error(first_rows[user.username], user.username,
+                            "user already exists", invalid=False)
+
+    def report(self, elapsed: float) -> dict:
+        return {
+            "status": "success",
+            "rows": self.rows,
+            "created": self.created,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "errors_truncated": len(self.errors) < self.duplicates + self.invalid,
+            "stats": {
+                "elapsed_seconds": round(elapsed, 3),
+                "rows_per_second": round(self.rows / elapsed, 1) if elapsed else None,
+                "hash_seconds": round(self.hash_seconds, 3),
+                "insert_seconds": round(self.insert_seconds, 3),
+            },
+        }
+
+    def _error(self, row_number: int, username: str | None, error: str, invalid: bool = True) -> None:
+        if invalid:
+            self.invalid += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "username": username, "error": error})
+
+
+async def import_users(db: AsyncSession, chunks: AsyncIterator[bytes], is_csv: bool) -> dict:
+    started = time.perf_counter()
+    user_import = UserImport(db, settings.user_import_batch_size, settings.user_import_max_errors)
+    async for row_number, row in iter_rows(chunks, is_csv):
+        await user_import.add(row_number, row)
+    await user_import.flush()
+    return user_import.report(time.perf_counter() - started)
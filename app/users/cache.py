@@ -0,0 +1,79 @@
+import hashlib
+from typing import Callable
+
+from fastapi import Request, Response, status
+
+from app.cache import MISSING, TTLCache
+from app.config import settings
+from app.database import replicas
+from app.users.queries import PUBLIC_COLUMN_NAMES
+
+
+class ResponseCache(TTLCache):
+    """
+    Bounded LRU cache of rendered user responses, keyed by route and query
+    parameters and holding (etag, body). Every user write clears it.
+    """
+
+    def get(self, key: str) -> tuple[str, bytes] | None:
+        entry = super().get(key)
+        return None if entry is MISSING else entry
+
+    def set(self, key: str, etag: str, body: bytes) -> None:
+        self.put(key, (etag, body))
+
+
+user_response_cache = ResponseCache(
+    maxsize=settings.user_response_cache_size,
+    ttl=settings.user_response_cache_ttl_seconds,
+)
+
+
+def compute_etag(users, *params) -> str:
+    """
+    Strong ETag of a response built from users: a hash of each row's id,
+    updatedAt and public columns, plus the parameters shaping the body.
+    Computed from the raw rows, before anything is serialized.
+    """
+    digest = hashlib.blake2b(repr(params).encode(), digest_size=16)
+    for user in users:
+        digest.update(repr(tuple(getattr(user, column) for column in PUBLIC_COLUMN_NAMES)).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def cached_response(request: Request, key: str) -> Response | None:
+    """
+    Answers from user_response_cache: 304 if the client has the entry, else the
+    cached body. Clients in their read-your-writes window skip the cache, which
+    may hold a page read from a replica that had not seen their write yet.
+    """
+    if replicas.reads_primary(request):
+        return None
+    entry = user_response_cache.get(key)
+    if entry is None:
+        return None
+    etag, body = entry
+    if _matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_headers(etag))
+    return Response(body, media_type="application/json", headers=_headers(etag))
+
+
+def render(request: Request, key: str, etag: str, serialize: Callable[[], bytes]) -> Response:
+    """304 when If-None-Match carries etag, otherwise calls serialize and caches the body."""
+    if _matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_headers(etag))
+    body = serialize()
+    user_response_cache.set(key, etag, body)
+    return Response(body, media_type="application/json", headers=_headers(etag))
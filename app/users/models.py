@@ -10,8 +10,8 @@ class User(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     username = Column(String, unique=True, nullable=False)
     password = Column(String(60), nullable=False)
-    uid = Column(String, unique=True, nullable=False, default=uuid.uuid4)
+    uid = Column(String, unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
     first_name = Column(String, nullable=True)
     last_name = Column(String, nullable=True)
     createdAt = Column(TIMESTAMP(timezone=True), nullable=True, server_default=func.now())
-    updatedAt = Column(TIMESTAMP(timezone=True), nullable=True, server_default=func.now())
+    updatedAt = Column(TIMESTAMP(timezone=True), nullable=True, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,17 @@
+from app import pagination
+
+
+def _parse(position: str) -> int:
+    prefix, _, last_id = position.partition(":")
+    if prefix != "id":
+        raise ValueError(position)
+    return int(last_id)
+
+
+def decode_cursor(cursor: str) -> int:
+    """The id of the row the page ends with."""
+    return pagination.decode_cursor(cursor, _parse)
+
+
+def next_cursor(rows: list, limit: int) -> str | None:
+    return pagination.next_cursor(rows, limit, lambda row: f"id:{row.id}")
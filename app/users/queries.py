@@ -0,0 +1,69 @@
+from typing import Literal
+
+from sqlalchemy import Select, select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.users.models import User
+
+
+TotalMode = Literal["exact", "estimated"]
+
+PUBLIC_COLUMN_NAMES = ("id", "uid", "username", "first_name", "last_name", "createdAt", "updatedAt")
+PUBLIC_COLUMNS = tuple(getattr(User, name) for name in PUBLIC_COLUMN_NAMES)
+
+
+def select_public() -> Select:
+    """
+    SELECT of the columns user responses need. Executing it returns plain
+    rows, never the password hash nor identity-mapped User objects.
+    """
+    return select(*PUBLIC_COLUMNS)
+
+
+def with_window_total(query: Select) -> Select:
+    """Adds a total column: COUNT(*) OVER () counts every row matching the WHERE clause, before LIMIT."""
+    return query.add_columns(func.count().over().label("total"))
+
+
+async def count_matching(db: AsyncSession, query: Select) -> int:
+    return (await db.execute(
+        select(func.count()).select_from(query.order_by(None).limit(None).offset(None).subquery())
+    )).scalar_one()
+
+
+async def estimated_count(db: AsyncSession) -> int | None:
+    """
+    Row count of the users table from the planner statistics (pg_class.reltuples),
+    kept up to date by autovacuum. None when they are unavailable: not Postgres,
+    or the table was never analyzed.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    reltuples = (await db.execute(
+        text("SELECT reltuples FROM pg_class WHERE oid = 'users'::regclass")
+    )).scalar_one_or_none()
+    if reltuples is None or reltuples < 0:
+        return None
+    return int(reltuples)
+
+
+async def page_total(db: AsyncSession, filtered: Select, rows: list, mode: TotalMode | None,
+                     windowed: bool, filters: bool) -> int | None:
+    """
+    Total of the users matched by filtered, the page query without LIMIT,
+    OFFSET and cursor.
+
+    "exact" reads the window count of the page when it has one, and only
+    falls back to a COUNT(*) for keyset pages and pages past the end.
+    "estimated" uses the planner statistics when nothing filters the
+    table, and is otherwise exact.
+    """
+    if mode is None:
+        return None
+    if mode == "estimated" and not filters:
+        estimate = await estimated_count(db)
+        if estimate is not None:
+            return estimate
+    if windowed and rows:
+        return rows[0].total
+    return await count_matching(db, filtered)
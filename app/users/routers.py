@@ -1,69 +1,102 @@
-from app.users import schemas, models
-from sqlalchemy.orm import Session
+from app.users import schemas, bulk, batch, export
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi import Depends, HTTPException, status, APIRouter
-from fastapi.security import HTTPBearer
+from fastapi import Depends, HTTPException, status, APIRouter, Request, Response
+from fastapi.responses import StreamingResponse
 
 from sqlalchemy.exc import IntegrityError
-from app.database import get_db
-from sqlalchemy import or_
-from passlib.context import CryptContext
-from typing import Annotated
+from app.database import get_db, get_read_db
+from sqlalchemy import select, insert, update, delete
+from typing import Annotated, Literal
 
 from app.auth.auth import get_current_user
+from app.auth.hashing import password_hasher
+from app.users.cache import user_response_cache, cached_response, compute_etag, render
 from app.users.models import User
+from app.users.pagination import decode_cursor, next_cursor
+from app.users.queries import PUBLIC_COLUMNS, TotalMode, select_public, with_window_total, page_total
+from app.users.search import SearchMode, apply_search
 from app.auth.schemas import Authinfo
 from app.api_keys.routers import api_key_security
+from app.monitoring.routing import InstrumentedRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
-user_dependency = Annotated[dict, Depends(get_current_user)]
-oauth2_bearer = HTTPBearer()
+user_dependency = Annotated[Authinfo, Depends(get_current_user)]
 
 
-@router.get('/')
-def get_users(db: Session = Depends(get_db),
+@router.get('/', response_model=schemas.ListUserResponse)
+async def get_users(request: Request,
+              db: AsyncSession = Depends(get_read_db),
               auth_info: dict = Depends(api_key_security),
               limit: int = 10,
               page: int = 1,
-              search: str = ''):
+              search: str = '',
+              search_mode: SearchMode = 'contains',
+              after: str | None = None,
+              total: TotalMode | None = None):
     """
        Retrieve a list of users with optional pagination.
 
        Args:
-           skip (int): Number of records to skip for pagination. Defaults to 0.
            limit (int): Maximum number of users to return. Defaults to 10.
-           db (Session): SQLAlchemy database session (injected dependency).
+           page (int): Page number, for offset pagination. Defaults to 1.
+           search (str): Only return users whose username or name contains it.
+           search_mode (str): "contains" keeps id order, "ranked" orders the
+               matches by relevance (paged with page only).
+           after (str): Cursor from a previous response's next_cursor. When set,
+               page is ignored and the query seeks with WHERE id > cursor.
+           total (str): "exact" to also return the number of matching users,
+               counted in the page query itself, or "estimated" to read it
+               from the planner statistics (only without search). Off by default.
+           db (AsyncSession): SQLAlchemy database session (injected dependency).
 
        Returns:
-           List[UserResponse]: A list of user data objects.
+           List[UserResponse]: A list of user data objects,
+           next_cursor to fetch the following page and the requested total.
+           304 Not Modified when If-None-Match matches the page's ETag.
        """
-    skip = (page -1) * limit
-    if search is None:
-        users = db.query(User).order_by(User.id.asc()).filter().limit(limit).offset(skip).all()
-        return {'status': 'success', 'results': len(users), 'users': users}
-    users = db.query(User).order_by(User.id.asc()).filter(
-        or_(
-            User.username.contains(search),
-            User.first_name.contains(search),
-            User.last_name.contains(search)
-        )
-    ).limit(limit).offset(skip).all()
-    return {'status': 'success', 'results': len(users), 'users': users}
+    ranked = bool(search) and search_mode == 'ranked'
+    if ranked and after is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Ranked search is paged with page, not after")
+    key = f"users:{limit}:{page}:{search_mode}:{after}:{total}:{search}"
+    cached = cached_response(request, key)
+    if cached is not None:
+        return cached
+
+    filtered = select_public().order_by(User.id.asc())
+    if search:
+        filtered = await apply_search(db, filtered, search, search_mode)
+    query = filtered.limit(limit)
+    if after is not None:
+        query = query.filter(User.id > decode_cursor(after))
+    else:
+        query = query.offset((page - 1) * limit)
+    windowed = total == 'exact' and after is None
+    if windowed:
+        query = with_window_total(query)
+    users = (await db.execute(query)).all()
+    count = await page_total(db, filtered, users, total, windowed, filters=bool(search))
+
+    return render(request, key, compute_etag(users, key, count), lambda: schemas.to_json(
+        schemas.list_user_response,
+        {'status': 'success', 'results': len(users), 'users': users,
+         'next_cursor': None if ranked else next_cursor(users, limit), 'total': count},
+    ))
 
 
 @router.post('/', status_code=status.HTTP_201_CREATED)
-def create_user(payload: schemas.UserCrateSchema, db: Session = Depends(get_db)):
+async def create_user(payload: schemas.UserCrateSchema, db: AsyncSession = Depends(get_db)):
 
     """
        Create new a user
 
        Args:
            payload (UserCrateSchema): The user data from the request body
-           db (Session): SQLAlchemy database session (injected dependency).
+           db (AsyncSession): SQLAlchemy database session (injected dependency).
 
        Returns:
            UserCrateSchema: The newly created user object.
@@ -72,34 +105,152 @@ def create_user(payload: schemas.UserCrateSchema, db: Session = Depends(get_db))
                HTTPException: If user's already exists in the database.
        """
 
-    new_user = models.User(
-        username = payload.username,
-        password = bcrypt_context.hash(payload.password)
-    )
-    db.add(new_user)
+    password = await password_hasher.hash(payload.password)
     try:
-        db.commit()
-        db.refresh(new_user)
+        username = (await db.execute(
+            insert(User).values(username=payload.username, password=password).returning(User.username)
+        )).scalar_one()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="User already exists")
-    return {'status': "success", 'username': new_user.username}
+    user_response_cache.clear()
+    return {'status': "success", 'username': username}
+
+
+@router.post('/import')
+async def import_users(request: Request,
+                       db: AsyncSession = Depends(get_db),
+                       auth_info: dict = Depends(api_key_security)):
+    """
+       Create users in bulk from a streamed request body.
+
+       The body is either NDJSON (one {"username": ..., "password": ...} object
+       per line) or CSV with a username,password header when the Content-Type
+       is text/csv. Rows are read, hashed and inserted in batches, so memory use
+       does not depend on the size of the upload.
+
+       Args:
+           request (Request): The request whose body is streamed.
+           db (AsyncSession): SQLAlchemy database session (injected dependency).
+
+       Returns:
+           created/duplicates/invalid counts, per-row errors and throughput stats.
+       """
+    is_csv = request.headers.get('content-type', '').split(';')[0].strip() == 'text/csv'
+    try:
+        return await bulk.import_users(db, request.stream(), is_csv)
+    finally:
+        user_response_cache.clear()
+
+
+@router.get('/export')
+def export_users(request: Request,
+                 auth_info: dict = Depends(api_key_security),
+                 format: Literal['ndjson', 'csv'] = 'ndjson',
+                 columns: str | None = None):
+    """
+       Stream every user as NDJSON or CSV.
+
+       Rows are read from a server-side cursor and written as they arrive, gzip
+       or zstd compressed when the client accepts it.
+
+       Args:
+           format (str): "ndjson" (default) or "csv".
+           columns (str): Comma separated columns to export. Defaults to all
+               public columns; the password hash is never exported.
+
+       Returns:
+           StreamingResponse: The exported users.
+       """
+    selected = export.parse_columns(columns)
+    encoding = export.choose_encoding(request.headers.get('accept-encoding', ''))
+    headers = {'Content-Disposition': f'attachment; filename="users.{format}"',
+               'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return StreamingResponse(export.stream_users(selected, format, encoding),
+                             media_type=export.MEDIA_TYPES[format], headers=headers)
+
+
+@router.post('/batch/get', response_model=schemas.UserBatchResponse)
+async def get_users_batch(payload: schemas.UserIdsSchema,
+                          db: AsyncSession = Depends(get_read_db),
+                          auth_info: dict = Depends(api_key_security)):
+    """
+       Retrieve many users by ID with a single query.
+
+       Args:
+           payload (UserIdsSchema): Up to user_batch_max_size ids.
+
+       Returns:
+           results: one {"id", "status": "found"|"missing", "user"} per id, in request order.
+       """
+    results = await batch.get_many(db, payload.ids)
+    return Response(schemas.to_json(schemas.user_batch_response, {'status': 'success', 'results': results}),
+                    media_type='application/json')
+
+
+@router.patch('/batch', response_model=schemas.UserBatchResponse, response_model_exclude_none=True)
+async def update_users_batch(payload: schemas.UserBatchUpdateSchema,
+                             db: AsyncSession = Depends(get_db),
+                             auth_info: dict = Depends(api_key_security)):
+    """
+       Apply partial updates to many users in one statement and one commit.
+
+       Args:
+           payload (UserBatchUpdateSchema): Up to user_batch_max_size
+               {"id", "first_name"?, "last_name"?} objects, ids unique.
+
+       Returns:
+           results: one {"id", "status": "updated"|"missing"} per id, in request order.
+       """
+    results = await batch.update_many(db, payload.users)
+    user_response_cache.clear()
+    return {'status': 'success', 'results': results}
+
+
+@router.post('/batch/delete', response_model=schemas.UserBatchResponse, response_model_exclude_none=True)
+async def delete_users_batch(payload: schemas.UserIdsSchema,
+                             db: AsyncSession = Depends(get_db),
+                             auth_info: dict = Depends(api_key_security)):
+    """
+       Delete many users by ID with a single statement.
+
+       Args:
+           payload (UserIdsSchema): Up to user_batch_max_size unique ids.
+
+       Returns:
+           results: one {"id", "status": "deleted"|"missing"} per id, in request order.
+
+       raises:
+               HTTPException: 409, deleting nothing, if one of the users still owns API keys.
+       """
+    results = await batch.delete_many(db, payload.ids)
+    user_response_cache.clear()
+    return {'status': 'success', 'results': results}
 
 
 @router.get('/me', description="Get Current user")
-def get_user_by_token(auth_info: Annotated[Authinfo, Depends(oauth2_bearer)]):
-    return {"status": status.HTTP_200_OK,"username":auth_info.username, "message": "OK"}
+async def get_user_by_token(auth_info: user_dependency, db: AsyncSession = Depends(get_read_db)):
+    username = (await db.execute(
+        select(User.username).filter(User.uid == auth_info.user_uid)
+    )).scalar_one_or_none()
+    if username is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="User not found")
+    return {"status": status.HTTP_200_OK, "username": username, "message": "OK"}
 
 
-@router.patch('/{userId}')
-def update_user(userId: int, payload: schemas.UserUpdateSchema, db: Session = Depends(get_db)):
+@router.patch('/{userId}', response_model=schemas.UserResponse)
+async def update_user(userId: int, payload: schemas.UserUpdateSchema, db: AsyncSession = Depends(get_db)):
 
     """
            Updating the user
 
            Args:
                payload (UserUpdateSchema): The user data from the request body
-               db (Session): SQLAlchemy database session (injected dependency).
+               db (AsyncSession): SQLAlchemy database session (injected dependency).
 
            Returns:
                status: "success",
@@ -109,70 +260,84 @@ def update_user(userId: int, payload: schemas.UserUpdateSchema, db: Session = De
                    HTTPException: If user's already exists in the database.
            """
 
-    user = db.query(models.User).filter(models.User.id == userId).first()
-
+    user = (await db.execute(
+        update(User)
+        .filter(User.id == userId)
+        .values(**payload.model_dump(exclude_unset=True))
+        .returning(*PUBLIC_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )).first()
     if not user:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f'No user with this id: {userId} found')
-
-    update_data = payload.model_dump(exclude_unset=True)
-
-    for key, value in update_data.items():
-        setattr(user, key, value)
-
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    user_response_cache.clear()
 
     return {"status": "success", "user": user}
 
 
-@router.get('/{userId}')
-def get_user(userId: int, db: Session = Depends(get_db)):
+@router.get('/{userId}', response_model=schemas.UserResponse)
+async def get_user(userId: int, request: Request, db: AsyncSession = Depends(get_read_db)):
     """
         Retrieve a user by ID.
 
         Args:
             user_id (int): The ID of the user to retrieve.
-            db (Session): SQLAlchemy database session (dependency injection).
+            db (AsyncSession): SQLAlchemy database session (dependency injection).
 
         Returns:
-            UserResponse: The user data if found.
+            UserResponse: The user data if found,
+            304 Not Modified when If-None-Match matches its ETag.
 
         Raises:
             HTTPException: If the user with the given ID does not exist.
         """
+    key = f"user:{userId}"
+    cached = cached_response(request, key)
+    if cached is not None:
+        return cached
 
-    user = db.query(models.User).filter(models.User.id == userId).first()
+    user = (await db.execute(select_public().filter(User.id == userId))).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"No user with this id: {userId} found")
 
-    return {"status": "success", "user": user}
+    return render(request, key, compute_etag([user], key), lambda: schemas.to_json(
+        schemas.user_response, {"status": "success", "user": user}
+    ))
 
 
 @router.delete('/{userId}')
-def delete_user(userId: str, db: Session = Depends(get_db)):
+async def delete_user(userId: int, db: AsyncSession = Depends(get_db)):
     """
         Delete a user by ID.
 
         Args:
             user_id (int): The ID of the user to retrieve.
-            db (Session): SQLAlchemy database session (dependency injection).
+            db (AsyncSession): SQLAlchemy database session (dependency injection).
 
         Returns:
             status: 200 OK
             message: Delete user is success
 
         Raises:
-            HTTPException: If the user with the given ID does not exist.
+            HTTPException: If the user with the given ID does not exist,
+            or 409 if they still own API keys.
         """
-
-    user_query = db.query(models.User).filter(models.User.id == userId)
-    note = user_query.first()
-    if not note:
+    try:
+        deleted = (await db.execute(
+            delete(User).filter(User.id == userId).returning(User.id)
+            .execution_options(synchronize_session=False)
+        )).first()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f'User {userId} still owns API keys')
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f'No user with this id: {userId} found')
-    user_query.delete(synchronize_session=False)
-    db.commit()
+    await db.commit()
+    user_response_cache.clear()
 
     return {"status":status.HTTP_200_OK, "message": "delete user is success"}
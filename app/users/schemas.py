@@ -1,20 +1,21 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, model_validator
+
+from app.config import settings
 
 
 class UserSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     uid: str
-    first_name: str
-    last_name: str
+    username: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
     createdAt: Optional[datetime] = None
     updatedAt: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
-        arbitrary_types_allowed = True
-
 
 class UserCrateSchema(BaseModel):
     username: str
@@ -25,8 +26,57 @@ class ListUserResponse(BaseModel):
     status: str
     results: int
     users: List[UserSchema]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class UserResponse(BaseModel):
+    status: str
+    user: UserSchema
 
 
 class UserUpdateSchema(BaseModel):
     first_name: str
     last_name: str
+
+
+class UserIdsSchema(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=settings.user_batch_max_size)
+
+
+class UserBatchUpdateItem(BaseModel):
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if not self.model_fields_set - {"id"}:
+            raise ValueError("set at least one field to update")
+        return self
+
+
+class UserBatchUpdateSchema(BaseModel):
+    users: List[UserBatchUpdateItem] = Field(min_length=1, max_length=settings.user_batch_max_size)
+
+
+class UserBatchResult(BaseModel):
+    id: int
+    status: Literal["found", "updated", "deleted", "missing"]
+    user: Optional[UserSchema] = None
+
+
+class UserBatchResponse(BaseModel):
+    status: str
+    results: List[UserBatchResult]
+
+
+# Built once at import: validating and dumping through them runs entirely in pydantic-core
+list_user_response = TypeAdapter(ListUserResponse)
+user_response = TypeAdapter(UserResponse)
+user_batch_response = TypeAdapter(UserBatchResponse)
+
+
+def to_json(adapter: TypeAdapter, data) -> bytes:
+    """Serializes data, whose users may be ORM objects or rows, straight to JSON bytes."""
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
@@ -0,0 +1,52 @@
+from typing import Literal
+
+from sqlalchemy import Select, or_, func, case, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.users.models import User
+
+
+SearchMode = Literal["contains", "ranked"]
+
+SEARCH_COLUMNS = ("username", "first_name", "last_name")
+
+# None until the first search checked whether pg_trgm is installed
+_trigram_available: bool | None = None
+
+
+async def has_trigram(db: AsyncSession) -> bool:
+    global _trigram_available
+    if _trigram_available is None:
+        if db.get_bind().dialect.name != "postgresql":
+            _trigram_available = False
+        else:
+            result = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+            _trigram_available = result.first() is not None
+    return _trigram_available
+
+
+async def apply_search(db: AsyncSession, query: Select, search: str, mode: SearchMode) -> Select:
+    """
+    Restricts query to users whose username, first_name or last_name contains search.
+
+    The LIKE predicates are served by the trigram indexes when pg_trgm is
+    installed. In "ranked" mode, rows are ordered by relevance: trigram
+    similarity with pg_trgm, otherwise exact > prefix > substring match
+    on the username.
+    """
+    columns = [getattr(User, column) for column in SEARCH_COLUMNS]
+    matches = [column.contains(search) for column in columns]
+    if mode != "ranked":
+        return query.filter(or_(*matches))
+
+    if await has_trigram(db):
+        # % is the trigram similarity operator, also served by the GIN indexes
+        matches += [column.op("%")(search) for column in columns]
+        score = func.greatest(*(func.similarity(column, search) for column in columns))
+    else:
+        score = case(
+            (User.username == search, literal(3)),
+            (User.username.startswith(search), literal(2)),
+            else_=literal(1),
+        )
+    return query.filter(or_(*matches)).order_by(None).order_by(score.desc(), User.id.asc())
@@ -0,0 +1,217 @@
+"""
+Throughput and latency of the main API routes.
+
+Boots the application from app.main.get_application() against the database
+given by --url (SQLite or a throwaway local Postgres), migrates it, seeds
+--users users with one signed API key each, then drives every route with
+--requests requests at --concurrency concurrent clients, in-process
+through httpx. Reports requests per second, p50/p99 latency, status codes
+and SQL statements per request (from the sql_statements_per_request
+metric). The per-API-key/user rate limit is disabled for the run;
+--no-cache also disables the API key, token and user response caches.
+
+    python -m benchmarks.endpoints --url postgresql://user:pw@localhost/bench --concurrency 1,16,64 --output endpoints.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import time
+from collections import Counter
+from datetime import timedelta
+
+PASSWORD = "bench-password"
+
+
+def seed(engine, users: int) -> list[str]:
+    """
+    Creates users bench0..bench{users-1} if missing, and issues each of them
+    a fresh signed API key, replacing the keys of previous runs.
+    Returns the keys, by user number.
+    """
+    from sqlalchemy import delete, func, insert, select
+
+    from app.api_keys.models import APIKey
+    from app.api_keys.signing import api_key_signer
+    from app.auth.hashing import bcrypt_context
+    from app.users.models import User
+
+    hashed = bcrypt_context().hash(PASSWORD)
+    with engine.begin() as conn:
+        existing = conn.execute(
+            select(func.count()).select_from(User).filter(User.username.like("bench%"))
+        ).scalar_one()
+        for start in range(existing, users, 10_000):
+            batch = range(start, min(start + 10_000, users))
+            conn.execute(insert(User), [
+                {"username": f"bench{i}", "password": hashed, "uid": f"bench-uid-{i}",
+                 "first_name": f"first{i}", "last_name": f"last{i}"}
+                for i in batch
+            ])
+        keys = [api_key_signer.issue(None) for _ in range(users)]
+        conn.execute(delete(APIKey).filter(APIKey.name == "bench"))
+        for start in range(0, users, 10_000):
+            conn.execute(insert(APIKey), [
+                {"api_key": APIKey.hash_api_key(keys[i]), "name": "bench",
+                 "user_uid": f"bench-uid-{i}", "is_active": True, "never_expire": True,
+                 "total_queries": 0, "iam_roles": ["admin"], "config": {}}
+                for i in range(start, min(start + 10_000, users))
+            ])
+    return keys
+
+
+def user_ids(engine, users: int) -> list[int]:
+    from sqlalchemy import select
+
+    from app.users.models import User
+
+    with engine.connect() as conn:
+        return list(conn.execute(
+            select(User.id).filter(User.username.like("bench%")).limit(users)
+        ).scalars())
+
+
+def scenarios(users: int, ids: list[int], keys: list[str]) -> dict:
+    """route label -> function building (method, url, request kwargs) for a random user."""
+    from app.auth.auth import create_access_token
+
+    tokens = [create_access_token(f"bench-uid-{i}", timedelta(hours=1)) for i in range(min(users, 1000))]
+
+    def key() -> dict:
+        return {"x-api-key": random.choice(keys)}
+
+    return {
+        "POST /api/auth/token": lambda: ("POST", "/api/auth/token", {
+            "data": {"username": f"bench{random.randrange(users)}", "password": PASSWORD}}),
+        "GET /api/users/": lambda: ("GET", "/api/users/", {
+            "params": {"limit": 10, "page": random.randint(1, max(1, users // 10))}, "headers": key()}),
+        "GET /api/users/ search": lambda: ("GET", "/api/users/", {
+            "params": {"limit": 10, "search": f"bench{random.randrange(users)}"}, "headers": key()}),
+        "GET /api/users/{userId}": lambda: ("GET", f"/api/users/{random.choice(ids)}", {}),
+        "GET /api/api-key/check_key": lambda: ("GET", "/api/api-key/check_key", {"headers": key()}),
+        "GET /api/api-key/list": lambda: ("GET", "/api/api-key/list", {
+            "headers": {"Authorization": f"Bearer {random.choice(tokens)}"}}),
+    }
+
+
+def statements(route: str) -> tuple[float, float]:
+    from prometheus_client import REGISTRY
+
+    labels = {"route": route.removesuffix(" search")}
+    return (REGISTRY.get_sample_value("sql_statements_per_request_sum", labels) or 0.0,
+            REGISTRY.get_sample_value("sql_statements_per_request_count", labels) or 0.0)
+
+
+async def drive(client, build, requests: int, concurrency: int) -> tuple[list[float], Counter, float]:
+    latencies = []
+    statuses = Counter()
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            method, url, kwargs = build()
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def run(args, ids: list[int], keys: list[str]) -> list[dict]:
+    from httpx import ASGITransport, AsyncClient
+
+    from app.main import get_application
+
+    app = get_application()
+    routes = scenarios(args.users, ids, keys)
+    if args.routes:
+        routes = {name: build for name, build in routes.items() if any(r in name for r in args.routes.split(","))}
+    results = []
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=ASGITransport(app=app, raise_app_exceptions=False),
+                               base_url="http://bench") as client:
+            for name, build in routes.items():
+                requests = args.token_requests if name.startswith("POST /api/auth/token") else args.requests
+                for concurrency in (int(c) for c in args.concurrency.split(",")):
+                    await drive(client, build, min(requests, args.warmup), concurrency)
+                    sum_before, count_before = statements(name)
+                    latencies, statuses, elapsed = await drive(client, build, requests, concurrency)
+                    sum_after, count_after = statements(name)
+                    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+                    result = {
+                        "route": name,
+                        "concurrency": concurrency,
+                        "requests": requests,
+                        "requests_per_second": round(requests / elapsed, 1),
+                        "p50_ms": round(percentiles[49] * 1000, 3),
+                        "p99_ms": round(percentiles[98] * 1000, 3),
+                        "statements_per_request": round(
+                            (sum_after - sum_before) / (count_after - count_before), 2
+                        ) if count_after > count_before else None,
+                        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+                    }
+                    results.append(result)
+                    print(f"{name:<28} c={concurrency:<4} {result['requests_per_second']:>9.1f} req/s  "
+                          f"p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms  "
+                          f"sql/req {result['statements_per_request']}  {result['statuses']}")
+    return results
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///bench_endpoints.sqlite"))
+    parser.add_argument("--users", type=int, default=1000, help="users and API keys to seed")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route and concurrency")
+    parser.add_argument("--token-requests", type=int, default=200,
+                        help="requests for /api/auth/token, which runs bcrypt")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", default="1,16")
+    parser.add_argument("--no-cache", action="store_true", help="disable the in-process caches")
+    parser.add_argument("--routes", help="comma separated substrings selecting routes to run")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    # settings are read when the app is imported
+    os.environ["DATABASE_URL"] = args.url
+    for limit in ("RATE_LIMIT", "RATE_LIMIT_ROUTES", "RATE_LIMIT_FAILED_AUTH"):
+        os.environ[limit] = ""
+    os.environ.setdefault("SECRET_KEY", "bench")
+    if args.no_cache:
+        for cache in ("APIKEY_CACHE_SIZE", "TOKEN_CACHE_SIZE", "USER_RESPONSE_CACHE_SIZE"):
+            os.environ[cache] = "0"
+
+    from sqlalchemy import create_engine
+
+    from app.migrate import upgrade
+
+    engine = create_engine(args.url)
+    upgrade(engine)
+    keys = seed(engine, args.users)
+    ids = user_ids(engine, args.users)
+    engine.dispose()
+
+    results = asyncio.run(run(args, ids, keys))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"revision": git_revision(), "url": args.url, "users": args.users,
+                       "caches": not args.no_cache, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
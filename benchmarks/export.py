@@ -0,0 +1,78 @@
+"""
+Memory and time to first byte of the streaming user export.
+
+Grows the users table to each size in --sizes and consumes
+app.users.export.stream_users, recording the time to the first chunk,
+the total time and the peak Python heap allocation (tracemalloc).
+
+    python -m benchmarks.export --url postgresql://user:pw@localhost/bench --sizes 100000,1000000,10000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app.database import AsyncSessionLocal  # noqa: E402
+from app.users.export import EXPORT_COLUMNS, stream_users  # noqa: E402
+from app.users.models import User  # noqa: E402
+from benchmarks.pagination import seed  # noqa: E402
+
+
+def async_url(url: str) -> str:
+    for sync, driver in (("postgresql://", "postgresql+asyncpg://"), ("sqlite://", "sqlite+aiosqlite://")):
+        if url.startswith(sync):
+            return driver + url[len(sync):]
+    return url
+
+
+async def consume(fmt: str, encoding: str | None) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    async for chunk in stream_users(list(EXPORT_COLUMNS), fmt, encoding):
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"first_byte_ms": round(first_byte * 1000, 3), "total_s": round(total, 3),
+            "peak_heap_mb": round(peak / 2**20, 2), "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///bench_export.sqlite"))
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--encoding", choices=["gzip", "zstd"], default=None)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    User.__table__.create(engine, checkfirst=True)
+    AsyncSessionLocal.configure(bind=create_async_engine(async_url(args.url)))
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        seed(engine, size)
+        result = {"rows": size, **asyncio.run(consume(args.format, args.encoding))}
+        results.append(result)
+        print(f"{size:>10} rows  first byte {result['first_byte_ms']:8.3f} ms  "
+              f"total {result['total_s']:8.3f} s  peak heap {result['peak_heap_mb']:7.2f} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"format": args.format, "encoding": args.encoding, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
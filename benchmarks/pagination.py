@@ -0,0 +1,74 @@
+"""
+Offset vs keyset pagination on the users table.
+
+Grows the users table to each size in --sizes and times fetching a page
+near the end of the table, once with LIMIT/OFFSET (the old ``page``
+parameter) and once with WHERE id > :after (the ``after`` cursor).
+
+    python -m benchmarks.pagination --url postgresql://user:pw@localhost/bench --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from sqlalchemy import create_engine, insert, select, func  # noqa: E402
+
+from app.users.models import User  # noqa: E402
+
+
+def seed(engine, size: int, batch: int = 10_000) -> None:
+    with engine.begin() as conn:
+        current = conn.execute(select(func.count()).select_from(User)).scalar_one()
+        for start in range(current, size, batch):
+            conn.execute(insert(User), [
+                {"username": f"user{i}", "password": "x" * 60, "uid": f"uid-{i}",
+                 "first_name": f"first{i}", "last_name": f"last{i}"}
+                for i in range(start, min(start + batch, size))
+            ])
+
+
+def timed(engine, query, repeat: int) -> float:
+    samples = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(query).all()
+            samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///bench_pagination.sqlite"))
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    User.__table__.create(engine, checkfirst=True)
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        seed(engine, size)
+        with engine.connect() as conn:
+            max_id = conn.execute(select(func.max(User.id))).scalar_one()
+        skip = size - args.limit
+        base = select(User).order_by(User.id.asc()).limit(args.limit)
+        offset_ms = timed(engine, base.offset(skip), args.repeat)
+        keyset_ms = timed(engine, base.filter(User.id > max_id - args.limit), args.repeat)
+        results.append({"rows": size, "offset_ms": round(offset_ms, 3), "keyset_ms": round(keyset_ms, 3)})
+        print(f"{size:>10} rows  offset {offset_ms:9.3f} ms  keyset {keyset_ms:9.3f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": engine.url.render_as_string(hide_password=True), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Serialization cost of user list responses.
+
+Renders a get_users response of --sizes users built from User ORM objects,
+the way the routes did before (jsonable_encoder over the ORM objects, then
+json.dumps as JSONResponse does) and the way they do now (validated and
+dumped by the precompiled list_user_response adapter). For comparison it
+also times jsonable_encoder + orjson, i.e. the generic path with only the
+response class switched to ORJSONResponse. No database is needed.
+
+    python -m benchmarks.serialization --sizes 10,100,1000
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime, UTC
+
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.users.models import User  # noqa: E402
+from app.users.schemas import list_user_response, to_json  # noqa: E402
+
+
+def users(size: int) -> list[User]:
+    now = datetime.now(UTC)
+    return [
+        User(id=i, uid=f"uid-{i}", username=f"user{i}", password="x" * 60,
+             first_name=f"first{i}", last_name=f"last{i}", createdAt=now, updatedAt=now)
+        for i in range(1, size + 1)
+    ]
+
+
+def generic_json(content: dict) -> bytes:
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def generic_orjson(content: dict) -> bytes:
+    return orjson.dumps(jsonable_encoder(content))
+
+
+def precompiled(content: dict) -> bytes:
+    return to_json(list_user_response, content)
+
+
+def timed(render, content: dict, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render(content)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        rows = users(size)
+        content = {"status": "success", "results": size, "users": rows, "next_cursor": None}
+        result = {"users": size, "bytes": len(precompiled(content))}
+        for name, render in (("jsonable_encoder_json_ms", generic_json),
+                             ("jsonable_encoder_orjson_ms", generic_orjson),
+                             ("precompiled_ms", precompiled)):
+            result[name] = round(timed(render, content, args.repeat), 4)
+        result["speedup"] = round(result["jsonable_encoder_json_ms"] / result["precompiled_ms"], 1)
+        results.append(result)
+        print(f"{size:>6} users  before {result['jsonable_encoder_json_ms']:9.4f} ms  "
+              f"orjson only {result['jsonable_encoder_orjson_ms']:9.4f} ms  "
+              f"after {result['precompiled_ms']:9.4f} ms  x{result['speedup']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
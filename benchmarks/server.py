@@ -0,0 +1,201 @@
+"""
+Throughput of the production launcher against the former single worker setup.
+
+Starts the server as a subprocess for each setup, serving the database given
+by --url (migrated and seeded as in benchmarks.endpoints), then loads it
+over real sockets from --clients load generator processes for --duration
+seconds per route. Setups:
+
+    baseline      uvicorn app.main:app --reload (asyncio loop, h11)
+    launcher-N    python -m app.server --workers N, for each N of --workers
+
+Also reports how long the server takes to exit after SIGTERM. The load
+generators share the machine with the server, so compare setups with each
+other rather than reading the numbers as capacity.
+
+    python -m benchmarks.server --url postgresql://user:pw@localhost/bench --workers 1,4 --output server.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.endpoints import git_revision, seed, user_ids
+
+
+def setups(workers: list[int]) -> dict[str, list[str]]:
+    commands = {
+        "baseline": [sys.executable, "-m", "uvicorn", "app.main:app", "--reload",
+                     "--loop", "asyncio", "--http", "h11"],
+    }
+    for count in workers:
+        commands[f"launcher-{count}"] = [sys.executable, "-m", "app.server", "--workers", str(count)]
+    return commands
+
+
+def routes(ids: list[int], keys: list[str]) -> dict:
+    """route label -> (method, path, headers) builders for a random user."""
+    return {
+        "GET /api/users/{userId}": lambda: ("GET", f"/api/users/{random.choice(ids)}", {}),
+        "GET /api/users/": lambda: ("GET", "/api/users/", {"x-api-key": random.choice(keys)}),
+        "GET /api/api-key/check_key": lambda: ("GET", "/api/api-key/check_key",
+                                               {"x-api-key": random.choice(keys)}),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port: int, timeout: float = 60) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def load(port: int, route: str, ids: list[int], keys: list[str], concurrency: int,
+         duration: float, results) -> None:
+    """One load generator process: concurrency keep-alive connections for duration seconds."""
+    import httpx
+
+    build = routes(ids, keys)[route]
+
+    async def run():
+        latencies, errors = [], 0
+        deadline = time.monotonic() + duration
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            async def worker():
+                nonlocal errors
+                while time.monotonic() < deadline:
+                    method, path, headers = build()
+                    started = time.perf_counter()
+                    try:
+                        response = await client.request(method, path, headers=headers)
+                        if response.status_code >= 400:
+                            errors += 1
+                    except httpx.TransportError:
+                        errors += 1
+                    latencies.append(time.perf_counter() - started)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors
+
+    results.put(asyncio.run(run()))
+
+
+def measure(port: int, route: str, ids, keys, args) -> dict:
+    results = multiprocessing.Queue()
+    per_client = max(1, args.concurrency // args.clients)
+    clients = [
+        multiprocessing.Process(target=load, args=(port, route, ids, keys, per_client, args.duration, results))
+        for _ in range(args.clients)
+    ]
+    for client in clients:
+        client.start()
+    latencies, errors = [], 0
+    for _ in clients:
+        client_latencies, client_errors = results.get()
+        latencies += client_latencies
+        errors += client_errors
+    for client in clients:
+        client.join()
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "route": route,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / args.duration, 1),
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+        "errors": errors,
+    }
+
+
+def bench_setup(name: str, command: list[str], ids, keys, args) -> dict:
+    port = free_port()
+    env = dict(os.environ, SERVER_HOST="127.0.0.1")
+    server = subprocess.Popen(command + ["--port", str(port)], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    try:
+        wait_ready(port)
+        results = []
+        for route in routes(ids, keys):
+            measure(port, route, ids, keys, argparse.Namespace(**{**vars(args), "duration": args.warmup}))
+            result = measure(port, route, ids, keys, args)
+            results.append(result)
+            print(f"{name:<12} {route:<28} {result['requests_per_second']:>9.1f} req/s  "
+                  f"p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms  errors {result['errors']}")
+        started = time.perf_counter()
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=60)
+        shutdown = time.perf_counter() - started
+        print(f"{name:<12} exited {server.returncode} {shutdown * 1000:.0f} ms after SIGTERM")
+        return {"setup": name, "command": command, "results": results,
+                "shutdown_ms": round(shutdown * 1000), "exit_code": server.returncode}
+    finally:
+        if server.poll() is None:
+            os.killpg(server.pid, signal.SIGKILL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///bench_server.sqlite"))
+    parser.add_argument("--users", type=int, default=1000, help="users and API keys to seed")
+    parser.add_argument("--workers", default=str(os.cpu_count() or 1),
+                        help="comma separated worker counts of the launcher")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per route")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of load before measuring")
+    parser.add_argument("--concurrency", type=int, default=64, help="connections over all clients")
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--setups", help="comma separated setup names to run, all by default")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    # read by the server subprocesses and by the seeding below
+    os.environ["DATABASE_URL"] = args.url
+    for limit in ("RATE_LIMIT", "RATE_LIMIT_ROUTES", "RATE_LIMIT_FAILED_AUTH"):
+        os.environ[limit] = ""
+    os.environ.setdefault("SECRET_KEY", "bench")
+
+    from sqlalchemy import create_engine
+
+    from app.migrate import upgrade
+
+    engine = create_engine(args.url)
+    upgrade(engine)
+    keys = seed(engine, args.users)
+    ids = user_ids(engine, args.users)
+    engine.dispose()
+
+    commands = setups([int(count) for count in args.workers.split(",")])
+    if args.setups:
+        commands = {name: command for name, command in commands.items() if name in args.setups.split(",")}
+    results = [bench_setup(name, command, ids, keys, args) for name, command in commands.items()]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"revision": git_revision(), "url": args.url, "cpus": os.cpu_count(),
+                       "concurrency": args.concurrency, "duration": args.duration,
+                       "setups": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Import time and cold start of the application.
+
+Each run starts a fresh interpreter that imports app.main, runs the lifespan
+startup and serves one request in-process, recording the time of each step.
+With --importtime, the slowest modules under app.main are listed from
+python -X importtime.
+
+    python -m benchmarks.startup --url postgresql://user:pw@localhost/bench --repeat 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def serve():
+    from httpx import ASGITransport, AsyncClient
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            response = await client.get("/api/users/1")
+        served = time.perf_counter()
+    return ready, served, response.status_code
+
+ready, served, status = asyncio.run(serve())
+print(json.dumps({"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000,
+                  "first_request_ms": (served - ready) * 1000, "status": status}))
+"""
+
+STEPS = ("import_ms", "startup_ms", "first_request_ms", "cold_start_ms")
+
+
+def child_env(url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=url)
+    env.setdefault("SECRET_KEY", "bench")
+    return env
+
+
+def run_once(url: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", CHILD], env=child_env(url),
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["cold_start_ms"] = result["import_ms"] + result["startup_ms"] + result["first_request_ms"]
+    return result
+
+
+def slowest_imports(url: str, top: int) -> list[dict]:
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            env=child_env(url), capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = line.split("|", 3) if line.count("|") == 3 else \
+            (None, *line.split(":", 1)[1].split("|"))
+        modules.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip())) // 2,
+                        "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///bench_startup.sqlite"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="also report the N slowest imports")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from app.migrate import upgrade
+
+    upgrade(create_engine(args.url))
+
+    runs = [run_once(args.url) for _ in range(args.repeat)]
+    summary = {
+        step: {"median": round(statistics.median(run[step] for run in runs), 2),
+               "min": round(min(run[step] for run in runs), 2),
+               "max": round(max(run[step] for run in runs), 2)}
+        for step in STEPS
+    }
+    for step, values in summary.items():
+        print(f"{step:>18}  median {values['median']:8.2f}  min {values['min']:8.2f}  max {values['max']:8.2f}")
+    results = {"url": args.url, "repeat": args.repeat, "summary": summary, "runs": runs}
+    if args.importtime:
+        results["slowest_imports"] = slowest_imports(args.url, args.importtime)
+        for module in results["slowest_imports"]:
+            print(f"{module['cumulative_ms']:10.2f} ms  {'  ' * module['depth']}{module['module']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
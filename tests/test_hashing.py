@@ -0,0 +1,24 @@
+import asyncio
+import os
+import signal
+
+os.environ.setdefault("SECRET_KEY", "test")
+
+from app.auth.hashing import PasswordHasher  # noqa: E402
+
+
+def test_verify_after_pool_process_dies():
+    hasher = PasswordHasher(workers=1, max_pending=4)
+
+    async def run():
+        hashed = await hasher.hash("secret")
+        for pid in list(hasher._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        await asyncio.sleep(0.5)
+        return await hasher.verify("secret", hashed)
+
+    try:
+        assert asyncio.run(run())
+        assert hasher.restarts == 1
+    finally:
+        hasher.shutdown()